@@ -0,0 +1,158 @@
+import argparse
+import contextlib
+import importlib
+import json
+import multiprocessing
+import os
+import resource
+import signal
+import sys
+import time
+from multiprocessing.connection import wait
+from game.engine import SokobanEngine
+from game.level_library import LevelLibrary
+
+SOLVERS = {"search": "solver.solver_search.SokobanSolverSearch",
+           "sat": "solver.solver_sat.SokobanSolverSAT",
+           "portfolio": "solver.solver_portfolio.SokobanSolverPortfolio"}
+
+
+def load_solver_class(name):
+    path = SOLVERS.get(name, name) # short name or full dotted path
+    module, cls = path.rsplit(".", 1)
+    return getattr(importlib.import_module(module), cls)
+
+
+def parse_levels(text, filename): # "1-10,12" style selection, everything in the file by default
+    if text is None:
+        return LevelLibrary.open(filename).names()
+    levels = []
+    for part in text.split(","):
+        if "-" in part:
+            start, end = part.split("-")
+            levels.extend(range(int(start), int(end) + 1))
+        else:
+            levels.append(int(part))
+    return levels
+
+
+def solve_level(filename, level, solver_name, options, memory_limit, conn):
+    os.setpgrp() # own process group, so a time limit kill also reaches processes the solver spawned
+    if memory_limit is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    result = {"level": level, "solved": False, "steps": None, "pushes": None, "expanded": None, "generated": None}
+    time0 = time.time()
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            solver = load_solver_class(solver_name)(SokobanEngine(filename, level).matrix, **options)
+            time1 = time.time()
+            solver.solve_for_one()
+            result["solve_time"] = round(time.time() - time1, 3) # search only, without parsing and replay
+            try:
+                controls = solver.get_controls()
+            except AssertionError: # no solution history
+                controls = None
+        result["expanded"] = getattr(solver, "n_expanded", None)
+        result["generated"] = getattr(solver, "n_generated", None)
+        if controls is not None:
+            result["solved"], result["pushes"] = SokobanEngine(filename, level).replay(controls)
+            result["steps"] = len(controls)
+    except MemoryError:
+        result["error"] = "memory limit"
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["wall_time"] = round(time.time() - time0, 3)
+    # the largest of this process and the children it waited for, e.g. the members of a portfolio
+    result["peak_rss_kb"] = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    conn.send(result)
+    conn.close()
+
+
+def kill_level(process): # the level worker and every process it spawned
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError: # the group does not exist yet or any more
+        process.kill()
+    process.join()
+
+
+def run_batch(filename, levels, solver_name, options, workers, time_limit, memory_limit, report):
+    # one process per level, at most workers at a time, every result is passed to report in completion order
+    load_solver_class(solver_name) # import once here so forked workers start warm
+    pending = list(levels)[::-1]
+    running = {} # sentinel -> (process, receiving end, level, start time)
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                level = pending.pop()
+                recv_conn, send_conn = multiprocessing.Pipe(duplex=False)
+                process = multiprocessing.Process(target=solve_level,
+                                                  args=(filename, level, solver_name, options, memory_limit,
+                                                        send_conn))
+                process.start()
+                send_conn.close()
+                running[process.sentinel] = (process, recv_conn, level, time.time())
+
+            timeout = None
+            if time_limit is not None:
+                timeout = max(0, min(start + time_limit for _, _, _, start in running.values()) - time.time())
+            for sentinel in wait(list(running.keys()), timeout):
+                process, conn, level, start = running.pop(sentinel)
+                try:
+                    result = conn.recv()
+                except EOFError: # killed before reporting, usually by the memory limit
+                    result = {"level": level, "solved": False, "error": f"exit code {process.exitcode}",
+                              "wall_time": round(time.time() - start, 3)}
+                process.join()
+                report(result)
+
+            if time_limit is not None:
+                for sentinel, (process, conn, level, start) in list(running.items()):
+                    if time.time() - start >= time_limit:
+                        kill_level(process)
+                        conn.close()
+                        del running[sentinel]
+                        report({"level": level, "solved": False, "error": "time limit",
+                                "wall_time": round(time.time() - start, 3)})
+    finally: # also on Ctrl-C, the workers are in their own process groups and do not get the SIGINT
+        for process, conn, _, _ in running.values():
+            kill_level(process)
+            conn.close()
+
+
+def write_result(out, result):
+    out.write(json.dumps(result) + "\n")
+    out.flush()
+
+
+def parse_options(pairs): # key=value, values are read as JSON when possible
+    options = {}
+    for pair in pairs:
+        key, value = pair.split("=", 1)
+        try:
+            options[key] = json.loads(value)
+        except ValueError:
+            options[key] = value
+    return options
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve many levels headless and stream JSON lines")
+    parser.add_argument("--levels", default=None, help="e.g. 1-10,12, all levels of the file by default")
+    parser.add_argument("--file", default="levels")
+    parser.add_argument("--solver", default="search", help="search, sat, portfolio or a dotted class path")
+    parser.add_argument("--step-limit", type=int, default=None)
+    parser.add_argument("--option", action="append", default=[], help="extra solver keyword, key=value")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--time-limit", type=float, default=None, help="seconds per level")
+    parser.add_argument("--memory-limit", type=int, default=None, help="MB per level")
+    parser.add_argument("--out", default=None, help="output file, stdout by default")
+    args = parser.parse_args()
+
+    options = {"step_limit": args.step_limit}
+    options.update(parse_options(args.option))
+    memory_limit = args.memory_limit * 1024 * 1024 if args.memory_limit is not None else None
+    out = open(args.out, 'a') if args.out is not None else sys.stdout
+    run_batch(args.file, parse_levels(args.levels, args.file), args.solver, options,
+              args.workers, args.time_limit, memory_limit, lambda result: write_result(out, result))
@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+import numpy as np
+from scipy.stats import ttest_ind
+from batch import load_solver_class, parse_levels, parse_options, run_batch
+
+# one configuration per entry, a solver short name followed by key=value solver keywords
+DEFAULT_CONFIGS = ["search mode=step heuristic=cost_ot",
+                   "search mode=push heuristic=push_ot",
+                   "search mode=push heuristic=incremental_ot",
+                   "search mode=push heuristic=push_ot bidirectional=true",
+                   "portfolio step_limit=60"] # SAT on its own needs a step_limit and is slow past the small levels
+TIMED_METRICS = ["solve_time", "peak_rss_kb"] # noisy, compared with Welch's t-test over the repeats
+COUNTED_METRICS = ["expanded", "generated", "steps"] # deterministic for a given tree, compared by their means
+
+
+def parse_config(spec): # "search mode=push heuristic=push_ot" -> (solver, options, normalized spec)
+    solver, *pairs = spec.split()
+    options = parse_options(pairs)
+    name = " ".join([solver] + [f"{key}={json.dumps(options[key])}" for key in sorted(options)])
+    return solver, options, name
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmark(filename, levels, configs, options, repeat, workers, time_limit, memory_limit, out, label):
+    # every (configuration, level) pair is solved repeat times in a fresh process, one JSON line per solve
+    # runs are sequential by default so timings do not compete for cores
+    run = {"run": time.strftime("%Y%m%d-%H%M%S"), "label": label, "commit": git_commit(), "file": filename}
+    for spec in configs:
+        solver, config_options, name = parse_config(spec)
+        solver_options = dict(options, **config_options)
+
+        def report(result):
+            expanded, seconds = result.get("expanded"), result.get("solve_time")
+            result["expanded_per_sec"] = round(expanded / seconds, 1) if expanded and seconds else None
+            out.write(json.dumps(dict(run, config=name, **result)) + "\n")
+            out.flush()
+            status = "solved" if result["solved"] else result.get("error", "unsolved")
+            print(f"{name:<60} level {result['level']:>4} {status:>12} steps {str(result.get('steps')):>5} "
+                  f"expanded {str(expanded):>8} {result['wall_time']:>8.2f}s")
+
+        load_solver_class(solver)
+        run_batch(filename, [level for level in levels for _ in range(repeat)], solver, solver_options,
+                  workers, time_limit, memory_limit, report)
+
+
+def load_run(path, run=None): # records of one run of a results file, the last run by default
+    with open(path, 'r') as file:
+        records = [json.loads(line) for line in file if line.strip()]
+    assert records, f"{path} has no results"
+    run = run or records[-1]["run"]
+    records = [r for r in records if r["run"] == run]
+    assert records, f"{path} has no run {run}"
+    groups = defaultdict(list)
+    for r in records:
+        groups[(r["config"], r["level"])].append(r)
+    return run, groups
+
+
+def compare(baseline_path, results_path, alpha, threshold, baseline_run=None, results_run=None):
+    # a slowdown is flagged when the mean grew by more than threshold and, for timed metrics, Welch's one sided
+    # t-test rejects equal means, with Holm's correction over all timed comparisons so that checking many levels
+    # does not flag noise; a level solved by the baseline and no longer solved is always flagged
+    # returns the number of flagged rows
+    baseline_run, baseline = load_run(baseline_path, baseline_run)
+    results_run, results = load_run(results_path, results_run)
+    rows = [] # [config, level, metric, baseline mean, results mean, change, p, flagged]
+    for key in sorted(set(baseline) & set(results)):
+        before, after = baseline[key], results[key]
+        if any(r["solved"] for r in before) and not any(r["solved"] for r in after): # solved fractions
+            rows.append([*key, "solved", np.mean([r["solved"] for r in before]), 0.0, -1.0, np.nan, True])
+        before = [r for r in before if r["solved"]]
+        after = [r for r in after if r["solved"]]
+        for metric in TIMED_METRICS + COUNTED_METRICS:
+            a = np.array([r[metric] for r in before if r.get(metric) is not None], dtype=np.float64)
+            b = np.array([r[metric] for r in after if r.get(metric) is not None], dtype=np.float64)
+            if len(a) == 0 or len(b) == 0:
+                continue
+            change = b.mean() / a.mean() - 1 if a.mean() > 0 else 0.0
+            rows.append([*key, metric, a.mean(), b.mean(), change, np.nan,
+                         metric in COUNTED_METRICS and change > threshold])
+            if metric in TIMED_METRICS and len(a) > 1 and len(b) > 1:
+                rows[-1][6] = 1.0 # counted as a comparison, only a growth past threshold is worth testing
+                if change > threshold:
+                    rows[-1][6] = ttest_ind(b, a, equal_var=False, alternative="greater").pvalue
+
+    tested = sorted((row for row in rows if not np.isnan(row[6])), key=lambda row: row[6])
+    for i, row in enumerate(tested): # Holm step down, stop at the first p above alpha / (m - i)
+        if row[6] > alpha / (len(tested) - i):
+            break
+        row[7] = row[5] > threshold
+
+    print(f"baseline {baseline_run}, results {results_run}, alpha {alpha}, threshold {threshold:.0%}")
+    print(f"{'config':<60} {'level':>5} {'metric':>12} {'baseline':>12} {'results':>12} {'change':>8} {'p':>7}")
+    for config, level, metric, a, b, change, p, flagged in rows:
+        print(f"{config:<60} {level:>5} {metric:>12} {a:>12.4g} {b:>12.4g} {change:>+8.1%} "
+              f"{'' if np.isnan(p) else f'{p:.4f}':>7}{'  SLOWER' if flagged else ''}")
+    for name, missing in [("baseline", set(results) - set(baseline)), ("results", set(baseline) - set(results))]:
+        if missing:
+            print(f"{len(missing)} (config, level) pairs missing from the {name}")
+    flagged = sum(row[7] for row in rows)
+    print(f"{flagged} regressions")
+    return flagged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark solver configurations and compare against a baseline")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="solve levels with every configuration, append JSON lines")
+    run_parser.add_argument("--levels", default="1-5", help="e.g. 1-10,12")
+    run_parser.add_argument("--file", default="levels")
+    run_parser.add_argument("--config", action="append", default=None,
+                            help='solver and keywords, e.g. "search mode=push heuristic=push_ot", repeatable')
+    run_parser.add_argument("--option", action="append", default=[], help="keyword for every config, key=value")
+    run_parser.add_argument("--step-limit", type=int, default=None)
+    run_parser.add_argument("--repeat", type=int, default=5, help="solves per level, the samples of the t-test")
+    run_parser.add_argument("--workers", type=int, default=1)
+    run_parser.add_argument("--time-limit", type=float, default=60, help="seconds per solve")
+    run_parser.add_argument("--memory-limit", type=int, default=None, help="MB per solve")
+    run_parser.add_argument("--label", default=None)
+    run_parser.add_argument("--out", default="benchmark.jsonl")
+    compare_parser = commands.add_parser("compare", help="flag slowdowns of a results file against a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("results")
+    compare_parser.add_argument("--alpha", type=float, default=0.05, help="family wise, over all timed comparisons")
+    compare_parser.add_argument("--threshold", type=float, default=0.05, help="relative slowdown to ignore")
+    compare_parser.add_argument("--baseline-run", default=None, help="run id, the last run of the file by default")
+    compare_parser.add_argument("--results-run", default=None)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        options = {"step_limit": args.step_limit}
+        options.update(parse_options(args.option))
+        memory_limit = args.memory_limit * 1024 * 1024 if args.memory_limit is not None else None
+        with open(args.out, 'a') as out:
+            run_benchmark(args.file, parse_levels(args.levels, args.file), args.config or DEFAULT_CONFIGS, options,
+                          args.repeat, args.workers, args.time_limit, memory_limit, out, args.label)
+    else:
+        sys.exit(1 if compare(args.baseline, args.results, args.alpha, args.threshold,
+                              args.baseline_run, args.results_run) else 0)
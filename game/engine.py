@@ -0,0 +1,145 @@
+import sys
+from game.logic import CONTROLS, WALL, BOX, BOX_ON_DOCK, DOCK, WORKER_ON_FLOOR, WORKER_ON_DOCK, FLOOR
+from game.level_library import LevelLibrary
+
+VALID_VALUES = {FLOOR, WALL, WORKER_ON_FLOOR, DOCK, BOX_ON_DOCK, BOX, WORKER_ON_DOCK}
+
+
+class SokobanEngine(object):
+    # same interface as SokobanLogic, the board lives in flat bytearray layers indexed by y * width + x
+    # with a tracked worker position and docked box count, so every move is O(1)
+    def __init__(self, filename, level):
+        self.load(LevelLibrary.open(filename).get_grid(level))
+
+    @classmethod
+    def from_matrix(cls, matrix):
+        engine = cls.__new__(cls)
+        engine.load(matrix)
+        return engine
+
+    def load(self, rows):
+        self.history = []
+        self.dirty = set()
+        self.matrix = [list(row) for row in rows]
+        self.height = len(self.matrix)
+        self.width = max(len(row) for row in self.matrix)
+        size = self.width * self.height
+        self.walls = bytearray(b'\x01' * size) # cells past the end of a short row count as wall
+        self.boxes = bytearray(size)
+        self.docks = bytearray(size)
+        self.worker_x, self.worker_y = None, None
+        for y, row in enumerate(self.matrix):
+            for x, c in enumerate(row):
+                if c not in VALID_VALUES:
+                    raise ValueError("Invalid value " + c)
+                i = y * self.width + x
+                self.walls[i] = c == WALL
+                self.boxes[i] = c in (BOX, BOX_ON_DOCK)
+                self.docks[i] = c in (DOCK, BOX_ON_DOCK, WORKER_ON_DOCK)
+                if c in (WORKER_ON_FLOOR, WORKER_ON_DOCK):
+                    self.worker_x, self.worker_y = x, y
+        self.n_boxes = sum(self.boxes)
+        self.n_docked = sum(b & d for b, d in zip(self.boxes, self.docks))
+
+    def load_size(self):
+        return (self.width * 32, self.height * 32)
+
+    def get_matrix(self):
+        return self.matrix
+
+    def print_matrix(self):
+        for row in self.matrix:
+            sys.stdout.write("".join(row) + '\n')
+        sys.stdout.flush()
+
+    def get_content(self, x, y):
+        return self.matrix[y][x]
+
+    def cell_char(self, i):
+        if self.walls[i]:
+            return WALL
+        if i == self.worker_y * self.width + self.worker_x:
+            return WORKER_ON_DOCK if self.docks[i] else WORKER_ON_FLOOR
+        if self.boxes[i]:
+            return BOX_ON_DOCK if self.docks[i] else BOX
+        return DOCK if self.docks[i] else FLOOR
+
+    def refresh(self, i): # keep the character view in step with the layers
+        y, x = divmod(i, self.width)
+        if x < len(self.matrix[y]):
+            self.matrix[y][x] = self.cell_char(i)
+            self.dirty.add((x, y))
+
+    def pop_dirty(self): # cells changed since the last call
+        dirty = self.dirty
+        self.dirty = set()
+        return dirty
+
+    def worker(self):
+        return (self.worker_x, self.worker_y, self.matrix[self.worker_y][self.worker_x])
+
+    def index(self, x, y): # flat index, -1 outside the board
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return y * self.width + x
+        return -1
+
+    def can_move(self, x, y):
+        i = self.index(self.worker_x + x, self.worker_y + y)
+        return i >= 0 and not self.walls[i] and not self.boxes[i]
+
+    def next(self, x, y):
+        return self.get_content(self.worker_x + x, self.worker_y + y)
+
+    def can_push(self, x, y):
+        i = self.index(self.worker_x + x, self.worker_y + y)
+        j = self.index(self.worker_x + x + x, self.worker_y + y + y)
+        return i >= 0 and j >= 0 and self.boxes[i] and not self.walls[j] and not self.boxes[j]
+
+    def is_completed(self):
+        return self.n_docked == self.n_boxes
+
+    def move_box(self, i, j):
+        self.boxes[i] = 0
+        self.boxes[j] = 1
+        self.n_docked += self.docks[j] - self.docks[i]
+
+    def move(self, x, y, save):
+        pushed = False
+        if self.can_move(x, y):
+            pass
+        elif self.can_push(x, y):
+            pushed = True
+        else:
+            return
+        old = self.worker_y * self.width + self.worker_x
+        self.worker_x += x
+        self.worker_y += y
+        new = self.worker_y * self.width + self.worker_x
+        if pushed:
+            beyond = new + y * self.width + x
+            self.move_box(new, beyond)
+            self.refresh(beyond)
+        self.refresh(old)
+        self.refresh(new)
+        if save:
+            self.history.append((x, y, pushed))
+
+    def unmove(self):
+        if self.history:
+            x, y, pushed = self.history.pop()
+            box = self.worker_y * self.width + self.worker_x
+            self.worker_x -= x
+            self.worker_y -= y
+            new = self.worker_y * self.width + self.worker_x
+            if pushed:
+                beyond = box + y * self.width + x
+                self.move_box(beyond, box)
+                self.refresh(beyond)
+            self.refresh(box)
+            self.refresh(new)
+
+    def replay(self, controls): # play a control sequence, returns (completed, number of pushes)
+        for control in controls:
+            self.move(*CONTROLS[control], True)
+        pushes = sum(1 for movement in self.history if movement[2])
+        return self.is_completed(), pushes
@@ -1,17 +1,20 @@
 import pygame
 import sys
-from game.logic import SokobanLogic
+from game.engine import SokobanEngine
+from game.solution_cache import SolutionCache
+from game.renderer import SokobanRenderer
 import time
-import os
-import numpy as np
 import torch
 from solver.search_util.policy import Action_Predictior
 from solver.search_util.value import Value_Predictior
 from solver.solver_search import SokobanSolverSearch
-from torch.utils.data import TensorDataset
+from solver.search_util.experience_dataset import ExperienceDataset
+from solver.search_util.learned import LearnedEvaluator
+
+FPS = 60
 
 class SokobanGame:
-    def __init__(self, level, solver=None, step_limit=None, data_dir=None, train_levels=None):
+    def __init__(self, level, solver=None, step_limit=None, data_dir=None, train_levels=None, cache_dir=None):
         self.wall = pygame.image.load('images/wall.png')
         self.floor = pygame.image.load('images/floor.png')
         self.box = pygame.image.load('images/box.png')
@@ -21,23 +24,32 @@ class SokobanGame:
         self.docker = pygame.image.load('images/dock.png')
 
         self.background = 255, 226, 191
+        self.renderer = None
 
         # self.level = self.start_game()
         self.level = level
-        self.logic = SokobanLogic('levels', self.level)
+        self.logic = SokobanEngine('levels', self.level)
         self.solver = None
         self.controls = None
         self.data_dir = data_dir
         self.action_pred = None
         self.value_pred = None
 
-        if solver is not None:
-            assert step_limit is not None
-            self.solver = solver(self.logic.matrix, step_limit=step_limit)
+        cache = SolutionCache(cache_dir) if cache_dir is not None else None
+        if solver is not None and cache is not None:
+            self.controls = cache.get(self.logic.matrix, solver, {"step_limit": step_limit})
+            if self.controls is not None:
+                print(f"\nLevel: {self.level}")
+                print(f"Use {len(self.controls)} steps (cached)")
 
-            # if train_levels is not None:
-            #     assert type(self.solver) is SokobanSolverSearch
-            #     self.value_pred, self.action_pred, self.train_model(train_levels)
+        if solver is not None and self.controls is None:
+            assert step_limit is not None
+            options = {}
+            if train_levels is not None: # guide the search with the value network trained on the experience
+                assert solver is SokobanSolverSearch
+                self.train_model(train_levels)
+                options = {"heuristic": "learned", "evaluator": LearnedEvaluator(self.value_pred.net)}
+            self.solver = solver(self.logic.matrix, step_limit=step_limit, **options)
 
             print(f"\nLevel: {self.level}")
             time0 = time.time()
@@ -46,50 +58,28 @@ class SokobanGame:
             time1 = time.time()
             print(f"Use {time1 - time0: .2f} seconds")
             print(f"Use {len(self.controls)} steps")
+            if cache is not None:
+                cache.put(self.logic.matrix, solver, {"step_limit": step_limit}, self.controls)
 
         if self.data_dir is not None and type(self.solver) is SokobanSolverSearch:
-            level_dir = os.path.join(self.data_dir, str(level))
-            os.makedirs(level_dir, exist_ok=True)
-            self.solver.get_data(level_dir)
-
-    def train_model(self, train_levels):
-        all_points = []
-        all_features = []
-        all_actions = []
-        all_scores = []
-        for level in train_levels:
-            all_points.append(np.load(os.path.join(self.data_dir, str(level), "points.npy")))
-            all_features.append(np.load(os.path.join(self.data_dir, str(level), "features.npy")))
-            all_actions.append(np.load(os.path.join(self.data_dir, str(level), "actions.npy")))
-            all_scores.append(np.load(os.path.join(self.data_dir, str(level), "scores.npy")))
-        # self.value_pred = Value_Predictior()
-        # self.value_pred.fit(all_points, all_features, all_scores)
+            self.solver.get_data(self.data_dir, level)
+
+    def train_model(self, train_levels): # streams the experience shards, the last level is held out for testing
+        train_levels, test_levels = train_levels[:-1], train_levels[-1:]
+        self.value_pred = Value_Predictior()
+        self.value_pred.fit(ExperienceDataset(self.data_dir, train_levels, "score", shuffle_buffer=4096),
+                            ExperienceDataset(self.data_dir, test_levels, "score"))
         self.action_pred = Action_Predictior()
-        self.action_pred.fit(all_points, all_features, all_actions)
-
-    def print_game(self, matrix, screen):
-        screen.fill(self.background)
-        x = 0
-        y = 0
-        for row in matrix:
-            for char in row:
-                if char == ' ':  # floor
-                    screen.blit(self.floor, (x, y))
-                elif char == '#':  # wall
-                    screen.blit(self.wall, (x, y))
-                elif char == '@':  # worker on floor
-                    screen.blit(self.worker, (x, y))
-                elif char == '.':  # dock
-                    screen.blit(self.docker, (x, y))
-                elif char == '*':  # box on dock
-                    screen.blit(self.box_docked, (x, y))
-                elif char == '$':  # box
-                    screen.blit(self.box, (x, y))
-                elif char == '+':  # worker on dock
-                    screen.blit(self.worker_docked, (x, y))
-                x = x + 32
-            x = 0
-            y = y + 32
+        self.action_pred.fit(ExperienceDataset(self.data_dir, train_levels, "action", shuffle_buffer=4096),
+                             ExperienceDataset(self.data_dir, test_levels, "action"))
+
+    def print_game(self, screen, full=False): # returns the rects to pass to pygame.display.update
+        if self.renderer is None or full:
+            tiles = {' ': self.floor, '#': self.wall, '@': self.worker, '.': self.docker,
+                     '*': self.box_docked, '$': self.box, '+': self.worker_docked}
+            self.renderer = SokobanRenderer(self.logic, tiles, self.background)
+            return [self.renderer.draw_full(screen)]
+        return self.renderer.draw_dirty(screen)
 
     def get_key(self):
         while 1:
@@ -165,9 +155,9 @@ class SokobanGame:
             self.controls = self.controls[::-1]
         time_elapsed_since_last_action = 0
         clock = pygame.time.Clock()
+        pygame.display.update(self.print_game(self.screen, full=True))
         while True:
-            self.print_game(self.logic.get_matrix(), self.screen)
-            dt = clock.tick()
+            dt = clock.tick(FPS)
             time_elapsed_since_last_action += dt
             if time_elapsed_since_last_action > interval:
                 pygame.event.get()
@@ -187,16 +177,16 @@ class SokobanGame:
                     elif control == "RIGHT":
                         self.logic.move(1, 0, True)
                 time_elapsed_since_last_action = 0
-            pygame.display.update()
+                pygame.display.update(self.print_game(self.screen))
 
 
     def play(self):
         self.size = self.logic.load_size()
         self.screen = pygame.display.set_mode(self.size)
+        clock = pygame.time.Clock()
+        pygame.display.update(self.print_game(self.screen, full=True))
+        overlay = False # the end message is on screen, it covers cells the dirty rects do not redraw
         while 1:
-            if self.logic.is_completed():
-                self.display_end(self.screen)
-            self.print_game(self.logic.get_matrix(), self.screen)
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     sys.exit(0)
@@ -213,4 +203,13 @@ class SokobanGame:
                         self.logic.unmove()
                     elif event.key == pygame.K_q:
                         sys.exit(0)
-            pygame.display.update()
+            rects = self.print_game(self.screen)
+            if rects:
+                completed = self.logic.is_completed()
+                if overlay and not completed: # undone after completion, clear the end message
+                    rects = self.print_game(self.screen, full=True)
+                pygame.display.update(rects)
+                if completed:
+                    self.display_end(self.screen)
+                overlay = completed
+            clock.tick(FPS)
@@ -0,0 +1,92 @@
+import json
+import os
+
+BOARD_CHARS = set(" #@.*$+")
+# alternative notations found in .xsb/.sok collections
+SOK_CHARS = {'-': ' ', '_': ' ', 'p': '@', 'P': '+', 'b': '$', 'B': '*'}
+
+_libraries = {}
+
+
+class LevelLibrary(object):
+    # byte offset index over a level collection, cached in <file>.idx and rebuilt when the file changes
+    # supports this repo's "Level N" file as well as plain .xsb/.sok collections (levels numbered from 1)
+    def __init__(self, filename):
+        self.filename = filename
+        self.index_filename = filename + ".idx"
+        self.offsets = self.load_index()
+        self.grids = {}
+
+    @classmethod
+    def open(cls, filename): # one library per file and process
+        path = os.path.abspath(filename)
+        if path not in _libraries:
+            _libraries[path] = cls(filename)
+        return _libraries[path]
+
+    def load_index(self):
+        stat = os.stat(self.filename)
+        try:
+            with open(self.index_filename, 'r') as file:
+                index = json.load(file)
+            if index["mtime"] == stat.st_mtime and index["size"] == stat.st_size:
+                return {name: (offset, length) for name, offset, length in index["levels"]}
+        except (OSError, ValueError, KeyError):
+            pass
+        offsets = self.build_index()
+        try:
+            with open(self.index_filename, 'w') as file:
+                json.dump({"mtime": stat.st_mtime, "size": stat.st_size,
+                           "levels": [[name, offset, length] for name, (offset, length) in offsets.items()]}, file)
+        except OSError: # read-only location, keep the index in memory only
+            pass
+        return offsets
+
+    def build_index(self):
+        offsets = {}
+        name = None
+        start = None
+        offset = 0
+        with open(self.filename, 'rb') as file:
+            for line in file:
+                text = line.decode().rstrip('\r\n')
+                if self.is_board_line(text):
+                    if start is None:
+                        start = offset
+                        if name is None or name in offsets:
+                            name = len(offsets) + 1
+                            while name in offsets:
+                                name += 1
+                else:
+                    if start is not None:
+                        offsets[name] = (start, offset - start)
+                        start = None
+                    if text.strip().startswith("Level "):
+                        name = int(text.strip()[len("Level "):])
+                offset += len(line)
+        if start is not None:
+            offsets[name] = (start, offset - start)
+        return offsets
+
+    def is_board_line(self, text):
+        return '#' in text and all(c in BOARD_CHARS or c in SOK_CHARS for c in text)
+
+    def names(self):
+        return list(self.offsets.keys())
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, level):
+        return level in self.offsets
+
+    def get_grid(self, level): # rows of the level as a tuple of strings, parsed on first access
+        if level not in self.grids:
+            if level not in self.offsets:
+                raise KeyError(f"Level {level} not found in {self.filename}")
+            offset, length = self.offsets[level]
+            with open(self.filename, 'rb') as file:
+                file.seek(offset)
+                rows = file.read(length).decode().splitlines()
+            self.grids[level] = tuple("".join(SOK_CHARS.get(c, c) for c in row) for row in rows)
+        return self.grids[level]
@@ -1,5 +1,6 @@
 import sys
 import queue
+from game.level_library import LevelLibrary
 
 FLOOR = ' '
 WALL = '#'
@@ -9,36 +10,17 @@ BOX_ON_DOCK = '*'
 BOX = '$'
 WORKER_ON_DOCK = '+'
 
+CONTROLS = {"UP": (0, -1), "DOWN": (0, 1), "LEFT": (-1, 0), "RIGHT": (1, 0)}
+
 class SokobanLogic:
     def __init__(self, filename, level):
         self.queue = queue.LifoQueue()
         self.matrix = []
-#        if level < 0 or level > 50:
-        if level < -1:
-            print("ERROR: Level "+str(level)+" is out of range")
-            sys.exit(1)
-        else:
-            file = open(filename,'r')
-            level_found = False
-            for line in file:
-                row = []
-                if not level_found:
-                    if  "Level "+str(level) == line.strip():
-                        level_found = True
-                else:
-                    if line.strip() != "":
-                        row = []
-                        for c in line:
-                            if c != '\n' and self.is_valid_value(c):
-                                row.append(c)
-                            elif c == '\n': #jump to next row when newline
-                                continue
-                            else:
-                                print("ERROR: Level "+str(level)+" has invalid value "+c)
-                                sys.exit(1)
-                        self.matrix.append(row)
-                    else:
-                        break
+        for row in LevelLibrary.open(filename).get_grid(level):
+            for c in row:
+                if not self.is_valid_value(c):
+                    raise ValueError("Level "+str(level)+" has invalid value "+c)
+            self.matrix.append(list(row))
 
     def is_valid_value(self,char):
         if ( char == ' ' or #floor
@@ -0,0 +1,41 @@
+import pygame
+from game.logic import FLOOR, WALL, DOCK, WORKER_ON_DOCK, BOX_ON_DOCK
+
+TILE = 32
+
+
+class SokobanRenderer(object):
+    # walls, floor and docks are composed once, afterwards only the cells reported dirty by the engine are redrawn
+    def __init__(self, engine, tiles, background):
+        self.engine = engine
+        self.tiles = tiles
+        self.static = pygame.Surface(engine.load_size())
+        self.static.fill(background)
+        for y, row in enumerate(engine.get_matrix()):
+            for x, char in enumerate(row):
+                self.static.blit(self.tiles[self.static_char(char)], (x * TILE, y * TILE))
+
+    def static_char(self, char):
+        if char in (WALL, FLOOR, DOCK):
+            return char
+        return DOCK if char in (WORKER_ON_DOCK, BOX_ON_DOCK) else FLOOR
+
+    def draw_cell(self, screen, x, y):
+        rect = pygame.Rect(x * TILE, y * TILE, TILE, TILE)
+        screen.blit(self.static, rect, rect)
+        char = self.engine.get_content(x, y)
+        if char != self.static_char(char):
+            screen.blit(self.tiles[char], rect)
+        return rect
+
+    def draw_full(self, screen):
+        screen.blit(self.static, (0, 0))
+        for y, row in enumerate(self.engine.get_matrix()):
+            for x, char in enumerate(row):
+                if char != self.static_char(char):
+                    self.draw_cell(screen, x, y)
+        self.engine.pop_dirty()
+        return screen.get_rect()
+
+    def draw_dirty(self, screen): # rects of the redrawn cells, for pygame.display.update
+        return [self.draw_cell(screen, x, y) for x, y in self.engine.pop_dirty()]
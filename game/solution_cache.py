@@ -0,0 +1,66 @@
+import hashlib
+import json
+import os
+from game.engine import SokobanEngine
+
+
+class SolutionCache(object):
+    # on-disk controls keyed by level content, solver class and solver parameters, oldest used entries go first
+    def __init__(self, cache_dir=".solution_cache", max_entries=1000, max_bytes=64 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_key(self, matrix, solver, params):
+        content = {"matrix": ["".join(row) for row in matrix],
+                   "solver": f"{solver.__module__}.{solver.__qualname__}",
+                   "params": params}
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, matrix, solver, params):
+        path = self.get_path(self.get_key(matrix, solver, params))
+        try:
+            with open(path, 'r') as file:
+                controls = json.load(file)["controls"]
+        except (OSError, ValueError, KeyError):
+            return None
+        if not self.verify(matrix, controls):
+            print(f"Cached solution {path} does not solve the level, dropped")
+            os.remove(path)
+            return None
+        os.utime(path) # mark as recently used
+        return controls
+
+    def put(self, matrix, solver, params, controls):
+        if controls is None or not self.verify(matrix, controls):
+            return
+        path = self.get_path(self.get_key(matrix, solver, params))
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump({"controls": controls}, file)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def verify(self, matrix, controls):
+        try:
+            completed, _ = SokobanEngine.from_matrix(matrix).replay(controls)
+        except (KeyError, TypeError): # unknown control in a damaged entry
+            return False
+        return completed
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+            _, size, name = entries.pop(0)
+            os.remove(os.path.join(self.cache_dir, name))
+            total_bytes -= size
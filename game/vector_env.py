@@ -0,0 +1,99 @@
+import numpy as np
+from game.logic import WALL, BOX, BOX_ON_DOCK, DOCK, WORKER_ON_FLOOR, WORKER_ON_DOCK
+from game.level_library import LevelLibrary
+
+# action index as in get_data, (row, col) offsets of DOWN, UP, RIGHT, LEFT
+ACTION_NAMES = ["DOWN", "UP", "RIGHT", "LEFT"]
+OFFSETS = np.array([(1, 0), (-1, 0), (0, 1), (0, -1)], dtype=np.int64)
+BORDER = 2 # padding walls around every board, a push target two cells away never leaves the array
+
+
+class VectorSokobanEnv(object):
+    # N boards as (N, H, W) boolean layers padded to the largest level, coordinates are (row, col)
+    # every call works on all boards at once, there is no Python loop over boards in step
+    def __init__(self, filename="levels"):
+        self.filename = filename
+        self.parsed = {}
+
+    def parse(self, level): # (rows, cols, floor, walls, boxes, docks, worker) of one level, rows may be ragged
+        if level not in self.parsed:
+            rows = LevelLibrary.open(self.filename).get_grid(level)
+            cells = [(r, c, char) for r, row in enumerate(rows) for c, char in enumerate(row)]
+            floor = [(r, c) for r, c, char in cells if char != WALL] # cells past a short row stay wall, as in the engine
+            walls = [(r, c) for r, c, char in cells if char == WALL]
+            boxes = [(r, c) for r, c, char in cells if char in (BOX, BOX_ON_DOCK)]
+            docks = [(r, c) for r, c, char in cells if char in (DOCK, BOX_ON_DOCK, WORKER_ON_DOCK)]
+            worker = [(r, c) for r, c, char in cells if char in (WORKER_ON_FLOOR, WORKER_ON_DOCK)]
+            assert len(worker) == 1 and len(boxes) == len(docks), f"Level {level} is not playable"
+            self.parsed[level] = (len(rows), max(len(row) for row in rows), floor, walls, boxes, docks, worker[0])
+        return self.parsed[level]
+
+    def reset(self, levels): # one board per entry of levels, returns the observation
+        parsed = [self.parse(level) for level in levels]
+        self.levels = list(levels)
+        n = len(parsed)
+        height = max(p[0] for p in parsed) + 2 * BORDER
+        width = max(p[1] for p in parsed) + 2 * BORDER
+        self.walls = np.ones((n, height, width), dtype=bool) # padding counts as wall for stepping
+        self.level_walls = np.zeros((n, height, width), dtype=bool) # only the '#' cells, for observations
+        self.docks = np.zeros((n, height, width), dtype=bool)
+        self.init_boxes = np.zeros((n, height, width), dtype=bool)
+        self.init_worker = np.zeros((n, 2), dtype=np.int64)
+        for b, (_, _, floor, walls, boxes, docks, worker) in enumerate(parsed):
+            for layer, points, value in [(self.walls, floor, False), (self.level_walls, walls, True),
+                                         (self.docks, docks, True), (self.init_boxes, boxes, True)]:
+                if points:
+                    r, c = np.array(points).T
+                    layer[b, r + BORDER, c + BORDER] = value
+            self.init_worker[b] = (worker[0] + BORDER, worker[1] + BORDER)
+        self.n_walls = self.level_walls.sum(axis=(1, 2))
+        self.n_docks = self.docks.sum(axis=(1, 2))
+        self.boxes = self.init_boxes.copy()
+        self.worker = self.init_worker.copy()
+        self.steps = np.zeros(n, dtype=np.int64)
+        return self.observe()
+
+    def reset_boards(self, boards): # back to the initial state, e.g. the boards that were completed
+        self.boxes[boards] = self.init_boxes[boards]
+        self.worker[boards] = self.init_worker[boards]
+        self.steps[boards] = 0
+
+    def step(self, actions): # one action index per board, returns (moved, pushed, completed) flags per board
+        idx = np.arange(len(self.worker))
+        offset = OFFSETS[np.asarray(actions)]
+        target = self.worker + offset
+        beyond = target + offset
+        blocked = self.walls[idx, target[:, 0], target[:, 1]]
+        on_box = self.boxes[idx, target[:, 0], target[:, 1]]
+        beyond_free = ~self.walls[idx, beyond[:, 0], beyond[:, 1]] & ~self.boxes[idx, beyond[:, 0], beyond[:, 1]]
+        moved = ~blocked & ~on_box
+        pushed = ~blocked & on_box & beyond_free
+        p = idx[pushed]
+        self.boxes[p, target[pushed, 0], target[pushed, 1]] = False
+        self.boxes[p, beyond[pushed, 0], beyond[pushed, 1]] = True
+        self.worker[moved | pushed] = target[moved | pushed]
+        self.steps += moved | pushed
+        return moved, pushed, self.is_completed()
+
+    def is_completed(self):
+        return ~(self.boxes & ~self.docks).any(axis=(1, 2))
+
+    def observe(self):
+        # get_data layout per board: walls, docks, boxes, worker points with one hot features, zero padded
+        # to the largest board, returns points (N, P, 2), features (N, P, 4) and the validity mask (N, P)
+        n = len(self.worker)
+        n_static = self.n_walls + self.n_docks
+        n_point = n_static + self.n_docks + 1
+        points = np.zeros((n, n_point.max(), 2), dtype=np.float32)
+        features = np.zeros((n, n_point.max(), 4), dtype=np.float32)
+        mask = (np.arange(n_point.max())[None] < n_point[:, None]).astype(np.float32)
+        for kind, (layer, start) in enumerate([(self.level_walls, np.zeros(n, dtype=np.int64)),
+                                               (self.docks, self.n_walls), (self.boxes, n_static)]):
+            b, r, c = np.nonzero(layer) # row major, grouped by board
+            first = np.searchsorted(b, np.arange(n)) # index of every board's first point
+            slot = start[b] + np.arange(len(b)) - first[b]
+            points[b, slot] = np.stack([r, c], axis=1) - BORDER
+            features[b, slot, kind] = 1
+        points[np.arange(n), n_point - 1] = self.worker - BORDER
+        features[np.arange(n), n_point - 1, 3] = 1
+        return points, features, mask
@@ -7,7 +7,7 @@ if __name__ == "__main__":
     data_dir = "experience"
 
     for level in range(103, 104):
-        game = SokobanGame(level, SokobanSolverSAT, 12) # 7.7
+        game = SokobanGame(level, SokobanSolverSAT, 12, cache_dir=".solution_cache") # 7.7
         # print("solution ready")
         # input()
         game.auto_play(50)
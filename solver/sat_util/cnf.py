@@ -0,0 +1,93 @@
+import itertools
+import numpy as np
+
+AMO_ENCODINGS = ("pairwise", "sequential", "commander", "ladder")
+
+
+class CNF(object):
+    # clauses over positive integer variables, a negative literal is the negated variable as in DIMACS
+    def __init__(self):
+        self.n_vars = 0
+        self.clauses = []
+        self.false = None # shared literal for variables that can never be true
+
+    def get_false(self):
+        if self.false is None:
+            self.false = self.new_var()
+            self.clauses.append([-self.false])
+        return self.false
+
+    def new_var(self):
+        self.n_vars += 1
+        return self.n_vars
+
+    def add_clause(self, lits):
+        if self.false is not None:
+            if -self.false in lits: # satisfied by the constant
+                return
+            lits = [lit for lit in lits if lit != self.false]
+        self.clauses.append(list(lits))
+
+    def at_most_one(self, lits, encoding="pairwise"):
+        assert encoding in AMO_ENCODINGS, f"Unknown at-most-one encoding {encoding}"
+        if len(lits) <= 1:
+            return
+        getattr(self, "amo_" + encoding)(list(lits))
+
+    def amo_pairwise(self, lits): # n(n-1)/2 binary clauses, no auxiliary variables
+        for i in range(len(lits)):
+            for j in range(i + 1, len(lits)):
+                self.add_clause([-lits[i], -lits[j]])
+
+    def amo_sequential(self, lits): # Sinz sequential counter, s_i means one of the first i literals is true
+        prefix = self.new_var()
+        self.add_clause([-lits[0], prefix])
+        for lit in lits[1:-1]:
+            next_prefix = self.new_var()
+            self.add_clause([-lit, next_prefix])
+            self.add_clause([-prefix, next_prefix])
+            self.add_clause([-lit, -prefix])
+            prefix = next_prefix
+        self.add_clause([-lits[-1], -prefix])
+
+    def amo_ladder(self, lits): # y_i means the true literal sits after position i, a true literal breaks the ladder
+        ladder = [self.new_var() for _ in range(len(lits) - 1)]
+        for i in range(1, len(ladder)):
+            self.add_clause([-ladder[i], ladder[i - 1]])
+        for i, lit in enumerate(lits):
+            if i > 0:
+                self.add_clause([-lit, ladder[i - 1]])
+            if i < len(ladder):
+                self.add_clause([-lit, -ladder[i]])
+
+    def amo_commander(self, lits, group_size=3): # pairwise inside groups, recursion over one commander per group
+        if len(lits) <= group_size + 1:
+            self.amo_pairwise(lits)
+            return
+        commanders = []
+        for start in range(0, len(lits), group_size):
+            group = lits[start:start + group_size]
+            commander = self.new_var()
+            self.amo_pairwise(group)
+            for lit in group:
+                self.add_clause([-lit, commander])
+            self.add_clause([-commander] + group)
+            commanders.append(commander)
+        self.amo_commander(commanders, group_size)
+
+    def used_vars(self): # mask over variable ids that occur in some clause
+        used = np.zeros(self.n_vars + 1, dtype=bool)
+        if self.clauses:
+            used[np.abs(np.fromiter(itertools.chain.from_iterable(self.clauses), dtype=np.int64))] = True
+        return used
+
+    def to_dimacs(self, clauses=None, n_vars=None):
+        clauses = self.clauses if clauses is None else clauses
+        n_vars = self.n_vars if n_vars is None else n_vars
+        lines = [f"p cnf {n_vars} {len(clauses)}"]
+        lines.extend(" ".join(map(str, clause)) + " 0" for clause in clauses)
+        return "\n".join(lines) + "\n"
+
+    def write_dimacs(self, path):
+        with open(path, 'w') as file:
+            file.write(self.to_dimacs())
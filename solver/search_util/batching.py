@@ -0,0 +1,26 @@
+import torch
+
+
+def pad_collate(samples):
+    # samples of (points, features, target) from levels with different n_point are zero padded to the largest
+    # returns points (B, N, 2), features (B, N, F), mask (B, N) with 1 on real points and the stacked targets
+    n_point = max(p.size(0) for p, _, _ in samples)
+    points = torch.zeros(len(samples), n_point, samples[0][0].size(1))
+    features = torch.zeros(len(samples), n_point, samples[0][1].size(1))
+    mask = torch.zeros(len(samples), n_point)
+    for b, (p, f, _) in enumerate(samples):
+        points[b, :p.size(0)] = p
+        features[b, :f.size(0)] = f
+        mask[b, :p.size(0)] = 1
+    targets = torch.stack([t for _, _, t in samples])
+    return points, features, mask, targets
+
+
+def mean_loss(net, loader, loss_fn): # one no_grad pass over padded batches, averaged per sample
+    total = 0.0
+    count = 0
+    with torch.no_grad():
+        for p, f, m, t in loader:
+            total += loss_fn(net(p, f, m), t).item() * p.size(0)
+            count += p.size(0)
+    return total / count
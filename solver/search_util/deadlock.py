@@ -0,0 +1,81 @@
+ALL_RULES = ("dead_square", "block", "freeze")
+
+
+class DeadlockChecker(object):
+    # incremental pruning stage, only the neighbourhood of the box pushed into a state is examined
+    def __init__(self, solver, rules=ALL_RULES):
+        for rule in rules:
+            assert rule in ALL_RULES, f"Unknown deadlock rule {rule}"
+        self.rules = [(rule, getattr(self, "check_" + rule)) for rule in rules]
+        self.neighbours = solver.neighbours
+        self.dead_bits = solver.dead_bits
+        self.dead_square = solver.dead_square
+        self.dock_bits = solver.dock_bits
+        self.hits = {rule: 0 for rule in rules}
+        self.checks = 0
+
+        # cells of the four 2x2 squares around every cell, -1 for wall
+        self.squares = []
+        for x, y in solver.cells:
+            squares = []
+            for dx in (1, -1):
+                for dy in (1, -1):
+                    square = [solver.Point(x+dx, y), solver.Point(x, y+dy), solver.Point(x+dx, y+dy)]
+                    squares.append(tuple(solver.cell_index.get(p, -1) for p in square))
+            self.squares.append(squares)
+
+    def is_dead(self, state):
+        if state.move < 0: # plain worker steps never create a deadlock
+            return False
+        box, d = divmod(state.move, 4)
+        box = self.neighbours[box][d]
+        self.checks += 1
+        for rule, check in self.rules:
+            if check(state.boxes, box):
+                self.hits[rule] += 1
+                return True
+        return False
+
+    def check_dead_square(self, boxes, box):
+        return self.dead_bits >> box & 1 == 1
+
+    def check_block(self, boxes, box): # 2x2 of boxes and walls with at least one box off dock
+        for square in self.squares[box]:
+            if all(c < 0 or boxes >> c & 1 for c in square):
+                on_dock = self.dock_bits >> box & 1
+                for c in square:
+                    if c >= 0 and not self.dock_bits >> c & 1:
+                        on_dock = False
+                if not on_dock:
+                    return True
+        return False
+
+    def check_freeze(self, boxes, box):
+        frozen = []
+        if self.is_frozen(boxes, box, {box}, frozen):
+            return any(not self.dock_bits >> c & 1 for c in frozen)
+        return False
+
+    def is_frozen(self, boxes, box, walls, frozen):
+        # a box is frozen when it is blocked along both axes, boxes already on the chain count as walls
+        for axis in ((0, 1), (2, 3)):
+            a, b = self.neighbours[box][axis[0]], self.neighbours[box][axis[1]]
+            if a < 0 or b < 0 or a in walls or b in walls:
+                continue
+            if self.dead_square[a] and self.dead_square[b]:
+                continue
+            blocked = False
+            for side in (a, b):
+                if boxes >> side & 1:
+                    n_frozen = len(frozen)
+                    if self.is_frozen(boxes, side, walls | {side}, frozen):
+                        blocked = True
+                        break
+                    del frozen[n_frozen:]
+            if not blocked:
+                return False
+        frozen.append(box)
+        return True
+
+    def report(self):
+        return f"Deadlock checks {self.checks}, hits {self.hits}"
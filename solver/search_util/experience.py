@@ -0,0 +1,99 @@
+import fcntl
+import json
+import os
+import numpy as np
+
+# one shard is a directory of flat int16 files opened with np.memmap plus index.json describing the episodes in it
+# geometry: (x, y, kind) rows, walls (kind 0) and docks (kind 1) stored once per episode
+# boxes: (x, y) rows, the initial boxes of every episode
+# steps: (worker x, worker y, action, box, box x, box y) rows, one per state, action -1 on the final state,
+#        box is the index of the box the step into this state pushed (-1 for none) and box x, y its new cell
+GEOMETRY_COLUMNS = 3
+BOX_COLUMNS = 2
+STEP_COLUMNS = 6
+ACTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)] # (row, col) offsets of DOWN, UP, RIGHT, LEFT, the control_mapping order
+SHARD_STEPS = 1 << 20
+
+
+def shard_names(data_dir):
+    if not os.path.isdir(data_dir):
+        return []
+    return sorted(name for name in os.listdir(data_dir) if name.startswith("shard_"))
+
+
+def load_index(shard_dir):
+    with open(os.path.join(shard_dir, "index.json"), 'r') as file:
+        return json.load(file)
+
+
+class ExperienceWriter(object):
+    # appends solved episodes to the last shard of data_dir, a new shard is started past shard_steps rows
+    # writers may share data_dir, every episode is appended under an exclusive lock on data_dir/lock
+    def __init__(self, data_dir, shard_steps=SHARD_STEPS):
+        self.data_dir = data_dir
+        self.shard_steps = shard_steps
+        os.makedirs(data_dir, exist_ok=True)
+
+    def open_shard(self):
+        # the index is the truth, rows past its counts were left by a writer that died before replacing it
+        # and are cut off, so the offsets of the next episode point at the rows it appends
+        shards = shard_names(self.data_dir)
+        self.shard_dir = os.path.join(self.data_dir, shards[-1] if shards else "shard_00000")
+        self.index = load_index(self.shard_dir) if shards else {"geometry": 0, "boxes": 0, "steps": 0, "episodes": []}
+        for name, columns in [("geometry", GEOMETRY_COLUMNS), ("boxes", BOX_COLUMNS), ("steps", STEP_COLUMNS)]:
+            path = os.path.join(self.shard_dir, name + ".i16")
+            size = self.index[name] * columns * 2
+            if os.path.exists(path) and os.path.getsize(path) != size:
+                assert os.path.getsize(path) > size, f"{path} is shorter than its index"
+                os.truncate(path, size)
+
+    def next_shard(self):
+        number = int(os.path.basename(self.shard_dir)[len("shard_"):]) + 1
+        self.shard_dir = os.path.join(self.data_dir, f"shard_{number:05d}")
+        self.index = {"geometry": 0, "boxes": 0, "steps": 0, "episodes": []}
+
+    def append(self, name, rows):
+        with open(os.path.join(self.shard_dir, name + ".i16"), 'ab') as file:
+            file.write(np.asarray(rows, dtype=np.int16).tobytes())
+
+    def add_episode(self, level, walls, docks, boxes, history): # history is the worker cell of every state
+        with open(os.path.join(self.data_dir, "lock"), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX) # released when the lock file is closed
+            self.open_shard()
+            self.write_episode(level, walls, docks, boxes, history)
+
+    def write_episode(self, level, walls, docks, boxes, history):
+        if self.index["steps"] > 0 and self.index["steps"] + len(history) > self.shard_steps:
+            self.next_shard()
+        os.makedirs(self.shard_dir, exist_ok=True)
+        geometry = [(x, y, 0) for x, y in sorted(walls)] + [(x, y, 1) for x, y in sorted(docks)]
+        boxes = sorted(boxes)
+        box_index = {b: i for i, b in enumerate(boxes)}
+        steps = []
+        for t, (x, y) in enumerate(history):
+            action, box, box_x, box_y = -1, -1, -1, -1
+            if t + 1 < len(history):
+                next_x, next_y = history[t + 1]
+                action = ACTIONS.index((next_x - x, next_y - y))
+            if t > 0:
+                pre_x, pre_y = history[t - 1]
+                if (x, y) in box_index: # the step into this state pushed the box standing here
+                    box = box_index.pop((x, y))
+                    box_x, box_y = 2 * x - pre_x, 2 * y - pre_y
+                    box_index[(box_x, box_y)] = box
+            steps.append((x, y, action, box, box_x, box_y))
+
+        episode = {"level": level, "n_walls": len(walls), "n_docks": len(docks),
+                   "geometry": self.index["geometry"], "boxes": self.index["boxes"],
+                   "steps": self.index["steps"], "length": len(history)}
+        self.append("geometry", geometry)
+        self.append("boxes", boxes)
+        self.append("steps", steps)
+        self.index["geometry"] += len(geometry)
+        self.index["boxes"] += len(boxes)
+        self.index["steps"] += len(steps)
+        self.index["episodes"].append(episode)
+        temp = os.path.join(self.shard_dir, "index.json.tmp")
+        with open(temp, 'w') as file: # the index is only replaced once the rows it points to are written
+            json.dump(self.index, file)
+        os.replace(temp, os.path.join(self.shard_dir, "index.json"))
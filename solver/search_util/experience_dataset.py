@@ -0,0 +1,85 @@
+import os
+import numpy as np
+import torch
+from torch.utils.data import IterableDataset, get_worker_info
+from solver.search_util.experience import GEOMETRY_COLUMNS, BOX_COLUMNS, STEP_COLUMNS, ACTIONS, shard_names, load_index
+
+
+class ExperienceDataset(IterableDataset):
+    # streams (points, features, target) samples in the get_data layout: walls, docks, boxes, then the worker
+    # target "action" gives the one-hot action of every non-final state, "score" the steps left to the goal
+    def __init__(self, data_dir, levels=None, target="action", shuffle_buffer=0, seed=0):
+        assert target in ["action", "score"]
+        self.target = target
+        self.shuffle_buffer = shuffle_buffer
+        self.seed = seed
+        self.epoch = 0 # a different shuffle on every pass
+        self.episodes = [] # (shard dir, episode)
+        for name in shard_names(data_dir):
+            shard_dir = os.path.join(data_dir, name)
+            for episode in load_index(shard_dir)["episodes"]:
+                if levels is None or episode["level"] in levels:
+                    self.episodes.append((shard_dir, episode))
+        self.shards = {}
+
+    def __len__(self):
+        return sum(episode["length"] - (self.target == "action") for _, episode in self.episodes)
+
+    def open_shard(self, shard_dir): # memory maps, opened lazily in every worker process
+        if shard_dir not in self.shards:
+            self.shards[shard_dir] = {name: np.memmap(os.path.join(shard_dir, name + ".i16"), dtype=np.int16, mode='r')
+                                      .reshape(-1, columns)
+                                      for name, columns in [("geometry", GEOMETRY_COLUMNS), ("boxes", BOX_COLUMNS),
+                                                            ("steps", STEP_COLUMNS)]}
+        return self.shards[shard_dir]
+
+    def iter_episode(self, shard_dir, episode):
+        shard = self.open_shard(shard_dir)
+        n_static = episode["n_walls"] + episode["n_docks"]
+        geometry = shard["geometry"][episode["geometry"]:episode["geometry"] + n_static]
+        steps = np.array(shard["steps"][episode["steps"]:episode["steps"] + episode["length"]])
+        n_boxes = episode["n_docks"]
+        boxes = np.array(shard["boxes"][episode["boxes"]:episode["boxes"] + n_boxes], dtype=np.float32)
+        n_point = n_static + n_boxes + 1
+
+        points = np.zeros((n_point, 2), dtype=np.float32)
+        features = np.zeros((n_point, 4), dtype=np.float32)
+        points[:n_static] = geometry[:, :2]
+        features[np.arange(n_static), geometry[:, 2]] = 1
+        features[n_static:n_static + n_boxes, 2] = 1
+        features[-1, 3] = 1
+        for t, (x, y, action, box, box_x, box_y) in enumerate(steps):
+            if box >= 0:
+                boxes[box] = (box_x, box_y)
+            if self.target == "action" and action < 0:
+                break
+            points[n_static:n_static + n_boxes] = boxes
+            points[-1] = (x, y)
+            if self.target == "action":
+                target = torch.zeros(len(ACTIONS))
+                target[action] = 1
+            else:
+                target = torch.tensor(float(len(steps) - (t + 1)))
+            yield torch.from_numpy(points.copy()), torch.from_numpy(features), target
+
+    def __iter__(self):
+        episodes = self.episodes
+        worker = get_worker_info()
+        if worker is not None: # every DataLoader worker streams its own slice of the episodes
+            episodes = episodes[worker.id::worker.num_workers]
+        rng = np.random.default_rng((self.seed, self.epoch))
+        self.epoch += 1
+        buffer = []
+        for shard_dir, episode in episodes:
+            for sample in self.iter_episode(shard_dir, episode):
+                if self.shuffle_buffer <= 1:
+                    yield sample
+                    continue
+                if len(buffer) < self.shuffle_buffer:
+                    buffer.append(sample)
+                    continue
+                i = rng.integers(len(buffer))
+                yield buffer[i]
+                buffer[i] = sample
+        rng.shuffle(buffer)
+        yield from buffer
@@ -0,0 +1,115 @@
+import argparse
+import contextlib
+import os
+import time
+from collections import OrderedDict
+import numpy as np
+import torch
+from solver.search_util.state import iter_bits
+from solver.search_util.value import Value_Net
+
+
+class LearnedEvaluator(object):
+    # heuristic from a value network predicting the steps left, states are scored in batches
+    # and the predictions are memoized by state hash in an LRU cache
+    def __init__(self, net, cache_size=1 << 16):
+        self.net = net
+        self.net.eval()
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.hits = 0
+        self.forwards = 0
+        self.scored = 0
+
+    @classmethod
+    def load(cls, path, cache_size=1 << 16): # a Value_Net state dict saved by Value_Predictior.save
+        net = Value_Net()
+        net.load_state_dict(torch.load(path))
+        return cls(net, cache_size)
+
+    def bind(self, solver): # static geometry of the level in the get_data layout: walls, docks, boxes, worker
+        # states of one level are never scored twice within a best first solve, the cache pays off across
+        # solves of the same level (reruns, other strategies, anytime reopening) and is only dropped when
+        # the geometry changes, as Zobrist keys of different levels are unrelated
+        geometry = (tuple(sorted(solver.walls)), tuple(sorted(solver.docks)), tuple(solver.cells))
+        if getattr(self, "geometry", None) == geometry:
+            return
+        self.geometry = geometry
+        static = sorted(solver.walls) + sorted(solver.docks)
+        self.n_static = len(static)
+        self.cells = np.array(solver.cells, dtype=np.float32)
+        self.points = np.zeros((self.n_static + len(solver.docks) + 1, 2), dtype=np.float32)
+        self.points[:self.n_static] = static
+        self.features = torch.zeros(len(self.points), 4)
+        self.features[:len(solver.walls), 0] = 1
+        self.features[len(solver.walls):self.n_static, 1] = 1
+        self.features[self.n_static:-1, 2] = 1
+        self.features[-1, 3] = 1
+        self.cache.clear()
+
+    def observe(self, states): # (B, N, 2) point clouds, every board of a level has the same N
+        points = np.repeat(self.points[None], len(states), axis=0)
+        for b, s in enumerate(states):
+            points[b, self.n_static:-1] = self.cells[list(iter_bits(s.boxes))]
+            points[b, -1] = self.cells[s.worker]
+        return torch.from_numpy(points)
+
+    def __call__(self, states): # predicted steps left per state, one forward for all cache misses
+        missing = {}
+        for s in states:
+            if s.hash_key not in self.cache:
+                missing[s.hash_key] = s
+        if missing:
+            batch = list(missing.values())
+            with torch.no_grad():
+                points = self.observe(batch)
+                values = self.net(points, self.features.expand(len(batch), -1, -1)).tolist()
+            self.forwards += 1
+            for s, value in zip(batch, values):
+                self.cache[s.hash_key] = max(value, 0.0)
+        self.scored += len(states)
+        self.hits += len(states) - len(missing)
+        scores = []
+        for s in states:
+            self.cache.move_to_end(s.hash_key)
+            scores.append(self.cache[s.hash_key])
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return scores
+
+    def report(self):
+        return f"Learned evaluator {self.forwards} forward passes, {self.hits} / {self.scored} cache hits"
+
+
+def compare(filename, levels, model, options, time_limit=None):
+    # expansions and wall time of the learned heuristic against cost_ot on the same levels
+    from game.engine import SokobanEngine
+    from solver.solver_search import SokobanSolverSearch
+    print(f"{'level':>5} {'heuristic':>10} {'solved':>6} {'steps':>6} {'expanded':>9} {'seconds':>8}")
+    for level in levels:
+        for heuristic in ["cost_ot", "learned"]:
+            extra = {"evaluator": LearnedEvaluator.load(model)} if heuristic == "learned" else {}
+            engine = SokobanEngine(filename, level)
+            solver = SokobanSolverSearch(engine.matrix, None, heuristic=heuristic, deadline=time_limit,
+                                         **extra, **options)
+            time0 = time.time()
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                solver.solve_for_one()
+            seconds = time.time() - time0
+            steps = len(solver.get_controls()) if solver.solution_history is not None else None
+            print(f"{level:>5} {heuristic:>10} {str(steps is not None):>6} {str(steps):>6} "
+                  f"{solver.n_expanded:>9} {seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the learned heuristic with cost_ot")
+    parser.add_argument("--model", required=True, help="Value_Net state dict")
+    parser.add_argument("--levels", default="1-5")
+    parser.add_argument("--file", default="levels")
+    parser.add_argument("--mode", default="step")
+    parser.add_argument("--pop-batch", type=int, default=16)
+    parser.add_argument("--time-limit", type=float, default=None, help="seconds per level and heuristic")
+    args = parser.parse_args()
+    start, _, end = args.levels.partition("-")
+    compare(args.file, range(int(start), int(end or start) + 1), args.model,
+            {"mode": args.mode, "pop_batch": args.pop_batch}, args.time_limit)
@@ -1,15 +1,47 @@
+import sys
+
+
+def iter_bits(bits): # yield the cell index of every set bit, lowest first
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
 
 class GameState(object):
-    def __init__(self, boxes, worker, parent):
+    # boxes is an integer bitboard over the solver's cell index, worker is a cell index
+    # move is the push leading to this state as box_cell * 4 + direction, -1 for a plain step
+    # g is the cost from the initial state, h and assignment are filled in by the incremental heuristic
+    # hash_key is the Zobrist key of (worker, boxes) kept up to date by the solver, None for path-only states
+    __slots__ = ("boxes", "worker", "parent", "move", "g", "h", "assignment", "hash_key")
+
+    def __init__(self, boxes, worker, parent, move=-1, g=0, hash_key=None):
         self.boxes = boxes
         self.worker = worker
         self.parent = parent
+        self.move = move
+        self.g = g
+        self.h = None
+        self.assignment = None
+        self.hash_key = hash_key
 
     def __eq__(self, other):
         return self.boxes == other.boxes and self.worker == other.worker
 
     def __hash__(self):
-        return hash( (self.worker, frozenset(self.boxes)))
+        return self.hash_key
+
+    def nbytes(self): # memory held by this state alone, parent excluded
+        return sys.getsizeof(self) + sys.getsizeof(self.boxes) + sys.getsizeof(self.worker) + sys.getsizeof(self.hash_key)
+
+    def get_path(self):
+        path = []
+        current = self
+        while current is not None:
+            path.append(current)
+            current = current.parent
+        path.reverse()
+        return path
 
     def get_history(self):
         history = []
@@ -18,4 +50,4 @@ class GameState(object):
             history.append(current.worker)
             current = current.parent
         history.reverse()
-        return history
\ No newline at end of file
+        return history
@@ -0,0 +1,69 @@
+import numpy as np
+
+SLOT_BYTES = 8 + 4 + 4 + 4 + 4 # key, parent slot, worker, move, g
+
+
+class TranspositionTable(object):
+    # closed set with a fixed memory budget, open addressing with linear probing over 64-bit Zobrist keys
+    # a slot keeps what is needed to rebuild the path: the parent's slot, the worker and the move into the state
+    # states are identified by their key alone, a 64-bit collision is accepted as practically impossible
+    def __init__(self, memory_bytes, max_load=0.9):
+        capacity = 1
+        while capacity * 2 * SLOT_BYTES <= memory_bytes:
+            capacity *= 2
+        self.capacity = capacity
+        self.mask = capacity - 1
+        self.limit = int(capacity * max_load)
+        self.keys = np.zeros(capacity, dtype=np.uint64) # 0 marks an empty slot
+        self.parents = np.full(capacity, -1, dtype=np.int32)
+        self.workers = np.zeros(capacity, dtype=np.int32)
+        self.moves = np.zeros(capacity, dtype=np.int32)
+        self.g = np.zeros(capacity, dtype=np.int32)
+        self.size = 0
+
+    def nbytes(self):
+        return self.keys.nbytes + self.parents.nbytes + self.workers.nbytes + self.moves.nbytes + self.g.nbytes
+
+    def is_full(self):
+        return self.size >= self.limit
+
+    def find(self, key): # slot of key, -1 when absent
+        key = key or 1
+        i = key & self.mask
+        while True:
+            stored = int(self.keys[i])
+            if stored == key:
+                return i
+            if stored == 0:
+                return -1
+            i = (i + 1) & self.mask
+
+    def __contains__(self, key):
+        return self.find(key) >= 0
+
+    def insert(self, key, parent, worker, move, g): # slot of the new entry, the existing slot is overwritten
+        assert not self.is_full(), "transposition table is full"
+        key = key or 1
+        i = key & self.mask
+        while True:
+            stored = int(self.keys[i])
+            if stored == 0:
+                self.size += 1
+                break
+            if stored == key:
+                break
+            i = (i + 1) & self.mask
+        self.keys[i] = key
+        self.parents[i] = parent
+        self.workers[i] = worker
+        self.moves[i] = move
+        self.g[i] = g
+        return i
+
+    def chain(self, slot): # (worker, move) from the root entry down to slot
+        chain = []
+        while slot >= 0:
+            chain.append((int(self.workers[slot]), int(self.moves[slot])))
+            slot = int(self.parents[slot])
+        chain.reverse()
+        return chain
@@ -1,68 +1,54 @@
 import torch
-from torch.utils.data import TensorDataset, ConcatDataset
+from torch.utils.data import IterableDataset
 from torch.utils.data.dataloader import DataLoader
 from torch.nn.modules.loss import MSELoss
 import torch.optim as optim
+from solver.search_util.batching import pad_collate, mean_loss
 
 POINT_FEATURE = 4
 HIDDEN_FEATURE = 4
 
-to_tensor = lambda t: torch.tensor(t, dtype=torch.float32)
-
 class Value_Net(torch.nn.Module):
     def __init__(self):
         super().__init__()
         self.point_linear_1 = torch.nn.Linear(in_features=2, out_features=HIDDEN_FEATURE)
         self.final_linear = torch.nn.Linear(in_features=HIDDEN_FEATURE*POINT_FEATURE, out_features=1)
 
-    def forward(self, points, features): # batch_size set to 1
-        assert points.size()[0] == 1
-        assert features.size()[0] == 1
-        points_hidden_1 = torch.relu(self.point_linear_1(points[0]))
-        all_hidden = torch.sigmoid(torch.matmul(points_hidden_1.t(), features[0]))
-        flatten_hidden = torch.flatten(all_hidden)
-        value = self.final_linear(flatten_hidden).unsqueeze(0)
+    def forward(self, points, features, mask=None): # padded batch (B, N, 2), (B, N, F), mask (B, N), one value per board
+        points_hidden_1 = torch.relu(self.point_linear_1(points))
+        if mask is not None:
+            points_hidden_1 = points_hidden_1 * mask.unsqueeze(-1)
+        all_hidden = torch.sigmoid(torch.matmul(points_hidden_1.transpose(1, 2), features))
+        flatten_hidden = torch.flatten(all_hidden, start_dim=1)
+        value = self.final_linear(flatten_hidden).squeeze(-1)
         return value
 
 class Value_Predictior:
     def __init__(self):
         self.net = Value_Net()
 
-    def fit(self, points, features, scores, n_epoch=2000, lr=5e-3):
-        datasets = []
+    def save(self, path): # state dict for LearnedEvaluator.load
+        torch.save(self.net.state_dict(), path)
+
+    def fit(self, train_set, test_set, n_epoch=2000, lr=5e-3, batch_size=64, eval_batch_size=1024):
+        # map-style or streaming datasets of (points, features, target), e.g. ExperienceDataset
         optimizer = optim.Adam(params=self.net.parameters(), lr=lr)
         mseLoss = MSELoss()
-        for p, f, s in zip(points, features, scores):
-            one_set = TensorDataset(to_tensor(p), to_tensor(f), to_tensor(s))
-            datasets.append(one_set)
-        train_loader = DataLoader(ConcatDataset(datasets[:-1]), batch_size=1, shuffle=True)
-        test_loader = DataLoader(ConcatDataset(datasets[-1:]), batch_size=1, shuffle=False)
+        train_loader = DataLoader(train_set, batch_size=batch_size, shuffle=not isinstance(train_set, IterableDataset),
+                                  collate_fn=pad_collate)
+        train_eval_loader = DataLoader(train_set, batch_size=eval_batch_size, collate_fn=pad_collate)
+        test_loader = DataLoader(test_set, batch_size=eval_batch_size, collate_fn=pad_collate)
         for e in range(n_epoch):
             print(f"Epoch: {e}")
-            for i, (p, f, s) in enumerate(train_loader):
-                out = self.net(p, f)
+            for i, (p, f, m, s) in enumerate(train_loader):
+                out = self.net(p, f, m)
                 loss = mseLoss(out, s)
                 loss.backward()
                 optimizer.step()
                 optimizer.zero_grad()
 
-            sum_loss = 0
-            with torch.no_grad():
-                for i, (p,f,s) in enumerate(train_loader):
-                    out = self.net(p, f)
-                    loss = mseLoss(out, s)
-                    sum_loss += loss
-            sum_loss /= len(train_loader)
-            print(f"Train Loss: {sum_loss.item()}")
-
-            sum_loss = 0
-            with torch.no_grad():
-                for i, (p,f,s) in enumerate(test_loader):
-                    out = self.net(p, f)
-                    loss = mseLoss(out, s)
-                    sum_loss += loss
-            sum_loss /= len(test_loader)
-            print(f"Test Loss: {sum_loss.item()}")
+            print(f"Train Loss: {mean_loss(self.net, train_eval_loader, mseLoss)}")
+            print(f"Test Loss: {mean_loss(self.net, test_loader, mseLoss)}")
 
 
 
@@ -1,5 +1,7 @@
 from game.logic import FLOOR, WALL, WORKER_ON_FLOOR, DOCK, BOX_ON_DOCK, BOX, WORKER_ON_DOCK
 from collections import namedtuple
+import numpy as np
+from solver.search_util.state import iter_bits
 
 class SokobanSolverBasic(object):
     def __init__(self, map):
@@ -36,6 +38,52 @@ class SokobanSolverBasic(object):
         assert len(self.init_boxes_loc) == len(self.docks)
         self.solver = None
 
+        # cell index per floor square, neighbour table follows the order of control_mapping (-1 for wall)
+        self.directions = list(self.control_mapping.keys())
+        self.cells = sorted(self.playabel)
+        self.cell_index = {p: i for i, p in enumerate(self.cells)}
+        self.neighbours = []
+        for x, y in self.cells:
+            self.neighbours.append(tuple(self.cell_index.get(self.Point(x+dx, y+dy), -1) for dx, dy in self.directions))
+
+        # Zobrist keys per cell for a box and for the worker, a state's key is the XOR of its pieces
+        rng = np.random.default_rng(0)
+        self.zobrist_box = [int(k) for k in rng.integers(1, 2 ** 63, size=len(self.cells), dtype=np.int64)]
+        self.zobrist_worker = [int(k) for k in rng.integers(1, 2 ** 63, size=len(self.cells), dtype=np.int64)]
+
+        # simple deadlocks, a box on a dead square can never be pushed onto any dock
+        self.dead_square = self.find_dead_squares()
+        self.dead_bits = 0
+        for i, dead in enumerate(self.dead_square):
+            if dead:
+                self.dead_bits |= 1 << i
+
+    def find_dead_squares(self): # reverse pull reachability from the docks, walls only
+        alive = bytearray(len(self.cells))
+        stack = [self.cell_index[p] for p in self.docks]
+        for cell in stack:
+            alive[cell] = 1
+        while stack:
+            cell = stack.pop()
+            for d, pos in enumerate(self.neighbours[cell]):
+                # pull the box from cell to pos, the worker steps from pos to the next cell
+                if pos >= 0 and not alive[pos] and self.neighbours[pos][d] >= 0:
+                    alive[pos] = 1
+                    stack.append(pos)
+        return bytearray(1 - a for a in alive)
+
+    def zobrist_key(self, boxes, worker): # full computation, successors derive theirs by XOR
+        key = self.zobrist_worker[worker]
+        for cell in iter_bits(boxes):
+            key ^= self.zobrist_box[cell]
+        return key
+
+    def to_bits(self, points):
+        bits = 0
+        for p in points:
+            bits |= 1 << self.cell_index[p]
+        return bits
+
     def get_one_step_move(self, x, y):
         reachabel = [self.Point(x-1,y), self.Point(x,y-1), self.Point(x,y+1), self.Point(x+1,y)]
         reachabel = set(filter(lambda point: (point.x, point.y) not in self.walls, reachabel))
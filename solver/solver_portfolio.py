@@ -0,0 +1,113 @@
+from solver.solver_basic import SokobanSolverBasic
+from game.engine import SokobanEngine
+import contextlib
+import importlib
+import multiprocessing
+import os
+import time
+from multiprocessing.connection import wait
+
+# (solver class or dotted path, extra keywords), every member also gets the portfolio's step_limit
+DEFAULT_PORTFOLIO = [("solver.solver_search.SokobanSolverSearch", {"mode": "push", "heuristic": "push_ot"}),
+                     ("solver.solver_sat.SokobanSolverSAT", {"encoding": "push", "incremental": True})]
+# SAT members grow by about 1 GB a minute past ~100 cells, on larger maps the portfolio leaves them out
+SAT_MAX_CELLS = 64
+
+
+def resolve_solver(solver):
+    if isinstance(solver, str):
+        module, cls = solver.rsplit(".", 1)
+        return getattr(importlib.import_module(module), cls)
+    return solver
+
+
+def run_member(solver, options, map, step_limit, conn):
+    # child process, reports (controls, expanded states) or (None, error message)
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            member = resolve_solver(solver)(map, step_limit=step_limit, **options)
+            member.solve_for_one()
+            try:
+                controls = member.get_controls()
+            except AssertionError: # no solution history
+                controls = None
+        conn.send((controls, getattr(member, "n_expanded", None)))
+    except Exception as e:
+        conn.send((None, f"{type(e).__name__}: {e}"))
+    conn.close()
+
+
+class SokobanSolverPortfolio(SokobanSolverBasic):
+    # runs several solvers on the same map in separate processes, the first solution that replays
+    # to a completed board wins and the remaining members are killed
+    def __init__(self, map, step_limit, solvers=DEFAULT_PORTFOLIO, time_limit=None, sat_max_cells=SAT_MAX_CELLS):
+        super().__init__(map)
+        self.map = [list(row) for row in map]
+        self.step_limit = step_limit
+        self.solvers = [(resolve_solver(solver), dict(options)) for solver, options in solvers]
+        from solver.solver_sat import SokobanSolverSAT
+        if sat_max_cells is not None and len(self.cells) > sat_max_cells:
+            self.solvers = [(solver, options) for solver, options in self.solvers
+                            if not issubclass(solver, SokobanSolverSAT)]
+            print(f"Portfolio: {len(self.cells)} cells, SAT members left out above {sat_max_cells}")
+        assert self.solvers, "no portfolio member left for this map"
+        # a member failing at once would leave the portfolio silently running the others alone
+        assert step_limit is not None or not any(issubclass(solver, SokobanSolverSAT) for solver, _ in self.solvers), \
+            "the SAT members of the portfolio need a step_limit"
+        self.time_limit = time_limit # seconds for the whole portfolio, None waits for every member
+        self.controls = None
+        self.winner = None
+        self.n_expanded = None
+
+    def member_name(self, index):
+        solver, options = self.solvers[index]
+        return solver.__name__ + "(" + ", ".join(f"{k}={v}" for k, v in options.items()) + ")"
+
+    def verify(self, controls):
+        return controls is not None and SokobanEngine.from_matrix(self.map).replay(controls)[0]
+
+    def solve_for_one(self):
+        time0 = time.time()
+        running = {} # receiving end -> (process, member index), ready on a report or on exit
+        for index, (solver, options) in enumerate(self.solvers):
+            recv_conn, send_conn = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=run_member,
+                                              args=(solver, options, self.map, self.step_limit, send_conn))
+            process.start()
+            send_conn.close()
+            running[recv_conn] = (process, index)
+
+        try:
+            while running and self.controls is None:
+                timeout = None
+                if self.time_limit is not None:
+                    timeout = time0 + self.time_limit - time.time()
+                    if timeout <= 0:
+                        break
+                for conn in wait(list(running.keys()), timeout):
+                    process, index = running.pop(conn)
+                    try:
+                        controls, info = conn.recv()
+                    except EOFError: # died before reporting
+                        controls, info = None, f"exit code {process.exitcode}"
+                    conn.close()
+                    process.join()
+                    if self.verify(controls):
+                        self.controls = controls
+                        self.winner = self.member_name(index)
+                        self.n_expanded = info
+                        break
+                    print(f"Portfolio: {self.member_name(index)} failed" + (f", {info}" if isinstance(info, str) else ""))
+        finally:
+            for conn, (process, _) in running.items():
+                process.kill()
+                process.join()
+                conn.close()
+
+        if self.controls is None:
+            print("Portfolio: no member found a solution")
+        else:
+            print(f"Portfolio: {self.winner} solved it in {time.time() - time0:.2f} seconds")
+
+    def get_controls(self):
+        return self.controls
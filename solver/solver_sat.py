@@ -1,207 +1,480 @@
 from pysmt.shortcuts import *
 from solver.solver_basic import SokobanSolverBasic
+from solver.sat_util.cnf import CNF
+import numpy as np
+import os
+import subprocess
+import tempfile
 
 
 
-class SymbolArray:
-    def __init__(self, name, dim):
+class VariableArray:
+    # a contiguous block of CNF variables, an index tuple is turned into an id by mixed radix arithmetic
+    # to_coords maps (x, y, ..., t) onto the block's shape and from_coords maps back for decoding
+    def __init__(self, name, dim, shape, offset, to_coords, from_coords):
         self.name = name
         self.dim = dim
-        self.arr = {}
-        self.reverse_mapping = {}
+        self.shape = shape
+        self.offset = offset # ids are offset + 1 .. offset + size
+        self.size = int(np.prod(shape))
+        self.to_coords = to_coords
+        self.from_coords = from_coords
 
     def __getitem__(self, idx):
         if type(idx) == int:
             idx = (idx,)
-        assert len(idx) == self.dim
-        if idx not in self.arr:
-            self.arr[idx] = Symbol(self.get_symbol_name(idx))
-        self.reverse_mapping[self.arr[idx]] = (self.name, idx)
-        return self.arr[idx]
+        var = 0
+        for c, n in zip(self.to_coords(idx), self.shape):
+            var = var * n + c
+        return self.offset + var + 1
+
+    def __contains__(self, var):
+        return self.offset < var <= self.offset + self.size
 
     def get_symbol_name(self, idx):
         return self.name + "(" + ",".join(map(lambda x: str(x), idx)) + ")"
 
-    def get_all_keys(self):
-        return set(self.reverse_mapping.keys())
+    def get_values(self, var):
+        coords = np.unravel_index(var - self.offset - 1, self.shape)
+        return (self.name, self.from_coords(tuple(int(c) for c in coords)))
 
-    def get_values(self, symb):
-        return self.reverse_mapping[symb]
+    def get_block(self, model): # model values of the whole block, shaped like the block
+        return model[self.offset + 1:self.offset + 1 + self.size].reshape(self.shape)
 
 
 class SokobanSolverSAT(SokobanSolverBasic):
-    def __init__(self, map, step_limit):
+    def __init__(self, map, step_limit, incremental=False, amo="pairwise", backend="pysmt", sat_command=None,
+                 reachability=True, encoding="step", walk_limit=None):
         super().__init__(map)
         self.nx = max(len(row) for row in map)
         self.ny = len(map)
         self.step_limit = step_limit
-        self.move = SymbolArray("m", dim=5)
-        self.push = SymbolArray("p", dim=5)
-        self.worker_at = SymbolArray("w", dim=3)
-        self.box_at = SymbolArray("b", dim=3)
+        # step: one move or push per time step, push: one push per time step after a walk of at most walk_limit cells
+        assert encoding in ["step", "push"]
+        self.encoding = encoding
+        self.reachability = reachability # only instantiate variables that can be true at their time step
+        self.worker_dist, self.box_dist, self.dock_dist = self.get_reachability()
+        # a walk is a simple path over the box free cells of the worker's region, so it is never longer than that
+        region = sum(1 for d in self.worker_dist if d < float("inf"))
+        self.walk_limit = walk_limit if walk_limit is not None else max(region - len(self.init_boxes_loc) - 1, 0)
+        self.cnf = CNF()
+        self.allocate_variables()
         self.goal_time_step = [self.step_limit]
+        self.incremental = incremental # deepen the horizon one step at a time on a single solver
+        self.horizon = None
+        self.amo = amo # at-most-one encoding of the actions in one time step
+        assert backend in ["pysmt", "dimacs"]
+        assert not (incremental and backend == "dimacs"), "incremental solving needs the pysmt backend"
+        self.backend = backend
+        self.sat_command = sat_command # external solver printing SAT competition output, e.g. ["kissat", "-q"]
+        self.symbols = {}
+        self.model = None
+        self.n_asserted = 0 # clauses already handed to the incremental solver
 
-        self.formula = self.encode_constraints()
+        if not self.incremental:
+            self.encode_constraints()
+        self.formula = None
         self.solver = None
+        self.controls = None
+
+    def allocate_variables(self):
+        # dense blocks sized for the full horizon, auxiliary variables of the CNF are numbered after them
+        T, n_cells, n_dirs = self.step_limit, len(self.cells), len(self.directions)
+        direction_index = {d: k for k, d in enumerate(self.directions)}
+        cell, point = self.cell_index.__getitem__, self.cells.__getitem__
+
+        def action_coords(idx):
+            x, y, tar_x, tar_y, t = idx
+            return t, cell((x, y)), direction_index[(tar_x - x, tar_y - y)]
+
+        def action_index(coords):
+            t, c, d = coords
+            (x, y), (dx, dy) = point(c), self.directions[d]
+            return x, y, x + dx, y + dy, t
+
+        def state_coords(idx):
+            x, y, t = idx
+            return t, cell((x, y))
+
+        def state_index(coords):
+            t, c = coords
+            return point(c) + (t,)
+
+        def reach_coords(idx):
+            x, y, t, k = idx
+            return t, cell((x, y)), k
+
+        def reach_index(coords):
+            t, c, k = coords
+            return point(c) + (t, k)
+
+        n_move = T if self.encoding == "step" else 0
+        n_push_layers = T if self.encoding == "push" else 0
+        blocks = [("move", "m", 5, (n_move, n_cells, n_dirs), action_coords, action_index),
+                  ("push", "p", 5, (T, n_cells, n_dirs), action_coords, action_index),
+                  ("worker_at", "w", 3, (T + 1, n_cells), state_coords, state_index),
+                  ("box_at", "b", 3, (T + 1, n_cells), state_coords, state_index),
+                  ("reach", "r", 4, (n_push_layers, n_cells, self.walk_limit + 1), reach_coords, reach_index),
+                  ("any_push", "a", 1, (n_push_layers,), lambda idx: idx, lambda coords: coords)]
+        self.arrays = []
+        for attr, name, dim, shape, to_coords, from_coords in blocks:
+            arr = VariableArray(name, dim, shape, self.cnf.n_vars, to_coords, from_coords)
+            self.cnf.n_vars += arr.size
+            setattr(self, attr, arr)
+            self.arrays.append(arr)
+
+    def get_reachability(self):
+        # fewest steps for the worker to reach each cell, fewest pushes for any box to reach it
+        # and fewest pushes from it to any dock (infinite on dead squares), walls only
+        inf = float("inf")
+        worker_dist = [inf] * len(self.cells)
+        box_dist = [inf] * len(self.cells)
+        dock_dist = [inf] * len(self.cells)
+        for dist, starts, can_pass in [(worker_dist, [self.init_worker_loc], lambda cell, d: True),
+                                       (box_dist, self.init_boxes_loc, lambda cell, d: self.neighbours[cell][d ^ 1] >= 0),
+                                       (dock_dist, self.docks, lambda cell, d: self.neighbours[self.neighbours[cell][d]][d] >= 0)]:
+            queue = []
+            for p in starts:
+                dist[self.cell_index[p]] = 0
+                queue.append(self.cell_index[p])
+            for cell in queue:
+                for d, pos in enumerate(self.neighbours[cell]):
+                    if pos >= 0 and dist[pos] == inf and can_pass(cell, d):
+                        dist[pos] = dist[cell] + 1
+                        queue.append(pos)
+        return worker_dist, box_dist, dock_dist
+
+    def walkable(self, cell): # inside the worker's region, cells cut off by walls never see the worker
+        return not self.reachability or self.worker_dist[cell] < float("inf")
+
+    def worker_possible(self, i, j, t): # walls have no variables at all
+        cell = self.cell_index.get((i, j))
+        if cell is None or not self.reachability:
+            return cell is not None
+        if self.encoding == "push" and t > 0: # pushes can end anywhere in the region
+            return self.walkable(cell)
+        return self.worker_dist[cell] <= t
 
-    def get_used_keys(self):
-        keys = set()
-        for arr_keys in [self.move, self.push, self.worker_at, self.box_at]:
-            keys = keys.union(arr_keys.get_all_keys())
-        return keys
+    def box_possible(self, i, j, t):
+        cell = self.cell_index.get((i, j))
+        if cell is None or not self.reachability:
+            return cell is not None
+        if t == 0:
+            return (i, j) in self.init_boxes_loc
+        return self.box_dist[cell] <= t and self.dock_dist[cell] <= self.step_limit - t
+
+    def worker_lit(self, i, j, t):
+        return self.worker_at[i, j, t] if self.worker_possible(i, j, t) else self.cnf.get_false()
+
+    def box_lit(self, i, j, t):
+        return self.box_at[i, j, t] if self.box_possible(i, j, t) else self.cnf.get_false()
+
+    def move_possible(self, i, j, tar_i, tar_j, t):
+        return self.worker_possible(i, j, t) and (tar_i, tar_j) in self.cell_index
+
+    def push_possible(self, i, j, tar_i, tar_j, t):
+        offset_x, offset_y = tar_i - i, tar_j - j
+        if (i, j) not in self.cell_index:
+            return False
+        if self.encoding == "step" and not self.worker_possible(i, j, t): # push encoding walks there first
+            return False
+        if self.encoding == "push" and not self.walkable(self.cell_index[(i, j)]):
+            return False
+        return self.box_possible(tar_i, tar_j, t) and self.box_possible(tar_i + offset_x, tar_j + offset_y, t+1)
 
     def encode_constraints(self):
         all_cons = [self.encode_init_state, self.encode_goal_state, self.encode_action_schema, self.encode_state_schema]  #
-        all_f = []
+        if self.encoding == "push":
+            all_cons = [self.encode_init_state, self.encode_goal_state, self.encode_push_schema]
         for func in all_cons:
-            partial_fomula = func()
-            all_f.append(partial_fomula)
-        final_formula = And(all_f)
-        return final_formula
+            func()
 
     def encode_init_state(self):
-        all_f = []
         for i,j in self.playabel:
             if (i,j) == self.init_worker_loc:
-                all_f.append(self.worker_at[i,j,0])
+                self.cnf.add_clause([self.worker_lit(i,j,0)])
             else:
-                all_f.append(Not(self.worker_at[i,j,0]))
+                self.cnf.add_clause([-self.worker_lit(i,j,0)])
             if (i,j) in self.init_boxes_loc:
-                all_f.append(self.box_at[i,j,0])
+                self.cnf.add_clause([self.box_lit(i,j,0)])
             else:
-                all_f.append(Not(self.box_at[i,j,0]))
-        return And(all_f)
+                self.cnf.add_clause([-self.box_lit(i,j,0)])
 
     def encode_goal_state(self):
-        all_f = []
+        goals = []
         for time in self.goal_time_step:
-            all_right_box = []
-            for i, j in self.docks:
-                all_right_box.append(self.box_at[i, j, time])
-            all_f.append(And(all_right_box))
-        return Or(all_f)
+            goals.append(self.encode_goal_step(time))
+        self.cnf.add_clause(goals)
+
+    def encode_goal_step(self, time): # returns a literal that implies every box is docked at time
+        goal = self.cnf.new_var()
+        for i, j in self.docks:
+            self.cnf.add_clause([-goal, self.box_lit(i, j, time)])
+        return goal
 
     def get_action_schema(self, action, para):
         assert len(para) == 5
         init_loc_x, init_loc_y, offset_x, offset_y, time_step = para
         if action is self.move:
-            pre = And(self.worker_at[init_loc_x, init_loc_y, time_step],
-                      Not(self.box_at[init_loc_x + offset_x, init_loc_y + offset_y, time_step]))
-            add = self.worker_at[init_loc_x + offset_x, init_loc_y + offset_y, time_step+1]
-            dele = Not(self.worker_at[init_loc_x, init_loc_y, time_step+1])
+            pre = [self.worker_lit(init_loc_x, init_loc_y, time_step),
+                   -self.box_lit(init_loc_x + offset_x, init_loc_y + offset_y, time_step)]
+            add = [self.worker_lit(init_loc_x + offset_x, init_loc_y + offset_y, time_step+1)]
+            dele = [-self.worker_lit(init_loc_x, init_loc_y, time_step+1)]
         elif action is self.push:
-            pre = And(self.worker_at[init_loc_x, init_loc_y, time_step],
-                      self.box_at[init_loc_x + offset_x, init_loc_y + offset_y, time_step],
-                      Not(self.box_at[init_loc_x + 2*offset_x, init_loc_y + 2*offset_y, time_step]))
-            add = And(self.worker_at[init_loc_x + offset_x, init_loc_y + offset_y, time_step+1],
-                      self.box_at[init_loc_x + 2*offset_x, init_loc_y + 2*offset_y, time_step+1])
-            dele = And(Not(self.worker_at[init_loc_x, init_loc_y, time_step+1]),
-                       Not(self.box_at[init_loc_x + offset_x, init_loc_y + offset_y, time_step+1]))
+            pre = [self.worker_lit(init_loc_x, init_loc_y, time_step),
+                   self.box_lit(init_loc_x + offset_x, init_loc_y + offset_y, time_step),
+                   -self.box_lit(init_loc_x + 2*offset_x, init_loc_y + 2*offset_y, time_step)]
+            add = [self.worker_lit(init_loc_x + offset_x, init_loc_y + offset_y, time_step+1),
+                   self.box_lit(init_loc_x + 2*offset_x, init_loc_y + 2*offset_y, time_step+1)]
+            dele = [-self.worker_lit(init_loc_x, init_loc_y, time_step+1),
+                    -self.box_lit(init_loc_x + offset_x, init_loc_y + offset_y, time_step+1)]
         else:
             raise NotImplementedError("Action not defined")
         return pre, add, dele
 
     def encode_action_schema(self):
-        all_f = []
         for time_step_action in range(self.step_limit):
-            all_action = []
-            for i,j in self.playabel:
-                reachable = self.get_one_step_move(i, j)
-                for tar_i, tar_j in reachable:
-                    offset_x, offset_y = tar_i - i, tar_j - j
+            self.encode_action_step(time_step_action)
+
+    def encode_action_step(self, time_step_action):
+        all_action = []
+        for i,j in self.playabel:
+            reachable = self.get_one_step_move(i, j)
+            for tar_i, tar_j in reachable:
+                offset_x, offset_y = tar_i - i, tar_j - j
+                if self.move_possible(i, j, tar_i, tar_j, time_step_action):
                     action = self.move[i, j, tar_i, tar_j, time_step_action]
                     all_action.append(action)
                     pre, add, dele = self.get_action_schema(self.move, (i, j, offset_x, offset_y, time_step_action))
-                    all_f.append(Implies(action, pre))
-                    all_f.append(Implies(action, add))
-                    all_f.append(Implies(action, dele))
-
-                    if (i + 2 * offset_x, j + 2 * offset_y) not in self.walls:
-                        action = self.push[i, j, tar_i, tar_j, time_step_action]
-                        all_action.append(action)
-                        pre, add, dele = self.get_action_schema(self.push, (i, j, offset_x, offset_y, time_step_action))
-                        all_f.append(Implies(action, pre))
-                        all_f.append(Implies(action, add))
-                        all_f.append(Implies(action, dele))
-
-            for a in all_action:
-                all_action_copy = all_action.copy()
-                all_action_copy.pop(all_action_copy.index(a))
-                for b in all_action_copy:
-                    all_f.append(Or(Not(a), Not(b)))
-        return And(all_f)
+                    for lit in pre + add + dele:
+                        self.cnf.add_clause([-action, lit])
+
+                if (i + 2 * offset_x, j + 2 * offset_y) not in self.walls and \
+                        self.push_possible(i, j, tar_i, tar_j, time_step_action):
+                    action = self.push[i, j, tar_i, tar_j, time_step_action]
+                    all_action.append(action)
+                    pre, add, dele = self.get_action_schema(self.push, (i, j, offset_x, offset_y, time_step_action))
+                    for lit in pre + add + dele:
+                        self.cnf.add_clause([-action, lit])
+
+        self.cnf.at_most_one(all_action, self.amo)
 
     def encode_state_schema(self):
-        all_f = []
         for time_step_action in range(self.step_limit):
-            for i,j in self.playabel:
-                reachable = self.get_one_step_move(i, j)
-                possible_out_move = []
-                possible_in_move = []
-                for tar_i, tar_j in reachable:
+            self.encode_state_step(time_step_action)
+
+    def encode_state_step(self, time_step_action):
+        for i,j in self.playabel:
+            reachable = self.get_one_step_move(i, j)
+            possible_out_move = []
+            possible_in_move = []
+            for tar_i, tar_j in reachable:
+                if self.move_possible(i, j, tar_i, tar_j, time_step_action):
                     possible_out_move.append(self.move[i, j, tar_i, tar_j, time_step_action])
+                if self.move_possible(tar_i, tar_j, i, j, time_step_action):
                     possible_in_move.append(self.move[tar_i, tar_j, i, j, time_step_action])
-                    offset_x, offset_y = tar_i - i, tar_j - j
-                    if (tar_i + offset_x, tar_j + offset_y) not in self.walls:
-                        possible_out_move.append(self.push[i, j, tar_i, tar_j, time_step_action])
-                    if (i - offset_x, j - offset_y) not in self.walls:
-                        possible_in_move.append(self.push[tar_i, tar_j, i, j, time_step_action])
-                all_f.append(Implies(And(Not(self.worker_at[i, j, time_step_action]), self.worker_at[i, j, time_step_action+1]),
-                                         Or(possible_in_move)))
-                all_f.append(Implies(And(self.worker_at[i, j, time_step_action], Not(self.worker_at[i, j, time_step_action+1])),
-                                         Or(possible_out_move)))
-
-                possible_out_push = []
-                possible_in_push = []
-                for tar_i, tar_j in reachable:
-                    offset_x, offset_y = tar_i - i, tar_j - j
-                    if (tar_i + offset_x, tar_j + offset_y) not in self.walls:
-                        possible_in_push.append(self.push[tar_i + offset_x, tar_j + offset_y, tar_i, tar_j, time_step_action])
-                    if (i - offset_x, j - offset_y) not in self.walls:
-                        possible_out_push.append(self.push[i - offset_x, j - offset_y, i, j, time_step_action])
-                all_f.append(Implies(And(Not(self.box_at[i, j, time_step_action]), self.box_at[i, j, time_step_action+1]),
-                                         Or(possible_in_push)))
-                all_f.append(Implies(And(self.box_at[i, j, time_step_action], Not(self.box_at[i, j, time_step_action+1])),
-                                         Or(possible_out_push)))
-        return And(all_f)
+                offset_x, offset_y = tar_i - i, tar_j - j
+                if (tar_i + offset_x, tar_j + offset_y) not in self.walls and \
+                        self.push_possible(i, j, tar_i, tar_j, time_step_action):
+                    possible_out_move.append(self.push[i, j, tar_i, tar_j, time_step_action])
+                if (i - offset_x, j - offset_y) not in self.walls and \
+                        self.push_possible(tar_i, tar_j, i, j, time_step_action):
+                    possible_in_move.append(self.push[tar_i, tar_j, i, j, time_step_action])
+            worker_now, worker_next = self.worker_lit(i, j, time_step_action), self.worker_lit(i, j, time_step_action+1)
+            self.cnf.add_clause([worker_now, -worker_next] + possible_in_move)
+            self.cnf.add_clause([-worker_now, worker_next] + possible_out_move)
 
+            possible_out_push = []
+            possible_in_push = []
+            for tar_i, tar_j in reachable:
+                offset_x, offset_y = tar_i - i, tar_j - j
+                if (tar_i + offset_x, tar_j + offset_y) not in self.walls and \
+                        self.push_possible(tar_i + offset_x, tar_j + offset_y, tar_i, tar_j, time_step_action):
+                    possible_in_push.append(self.push[tar_i + offset_x, tar_j + offset_y, tar_i, tar_j, time_step_action])
+                if (i - offset_x, j - offset_y) not in self.walls and \
+                        self.push_possible(i - offset_x, j - offset_y, i, j, time_step_action):
+                    possible_out_push.append(self.push[i - offset_x, j - offset_y, i, j, time_step_action])
+            box_now, box_next = self.box_lit(i, j, time_step_action), self.box_lit(i, j, time_step_action+1)
+            self.cnf.add_clause([box_now, -box_next] + possible_in_push)
+            self.cnf.add_clause([-box_now, box_next] + possible_out_push)
+
+    def encode_push_schema(self):
+        for time_step_action in range(self.step_limit):
+            self.encode_push_step(time_step_action)
+
+    def encode_push_step(self, t):
+        # the worker walks over box free cells (reach, layered by walk length) and then pushes exactly one box
+        all_push = []
+        push_in = {p: [] for p in self.playabel}
+        push_out = {p: [] for p in self.playabel}
+        for i, j in self.playabel:
+            for tar_i, tar_j in self.get_one_step_move(i, j):
+                offset_x, offset_y = tar_i - i, tar_j - j
+                if (tar_i + offset_x, tar_j + offset_y) in self.walls or not self.push_possible(i, j, tar_i, tar_j, t):
+                    continue
+                action = self.push[i, j, tar_i, tar_j, t]
+                all_push.append(action)
+                push_out[(tar_i, tar_j)].append(action)
+                push_in[(tar_i + offset_x, tar_j + offset_y)].append(action)
+                for lit in [self.reach[i, j, t, self.walk_limit],
+                            self.box_lit(tar_i, tar_j, t), -self.box_lit(tar_i + offset_x, tar_j + offset_y, t),
+                            self.box_lit(tar_i + offset_x, tar_j + offset_y, t+1), -self.box_lit(tar_i, tar_j, t+1),
+                            self.worker_lit(tar_i, tar_j, t+1), self.any_push[t]]:
+                    self.cnf.add_clause([-action, lit])
+        self.cnf.add_clause([-self.any_push[t]] + all_push)
+        self.cnf.at_most_one(all_push, self.amo)
+
+        for i, j in self.playabel:
+            if self.walkable(self.cell_index[(i, j)]): # reach variables only inside the worker's region
+                neighbours = [p for p in self.get_one_step_move(i, j)
+                              if p in self.cell_index and self.walkable(self.cell_index[p])]
+                self.cnf.add_clause([-self.reach[i, j, t, 0], self.worker_lit(i, j, t)])
+                for k in range(self.walk_limit + 1):
+                    self.cnf.add_clause([-self.reach[i, j, t, k], -self.box_lit(i, j, t)])
+                    if k > 0:
+                        self.cnf.add_clause([-self.reach[i, j, t, k], self.reach[i, j, t, k-1]] +
+                                            [self.reach[n_i, n_j, t, k-1] for n_i, n_j in neighbours])
+
+            # the worker stays put unless a push happens, a push leaves it on the box's old cell
+            worker_now, worker_next = self.worker_lit(i, j, t), self.worker_lit(i, j, t+1)
+            into = [a for a in push_out[(i, j)]]
+            self.cnf.add_clause([-worker_now, self.any_push[t], worker_next])
+            self.cnf.add_clause([-worker_next, worker_now] + into)
+            self.cnf.add_clause([-worker_next, -self.any_push[t]] + into)
+
+            box_now, box_next = self.box_lit(i, j, t), self.box_lit(i, j, t+1)
+            self.cnf.add_clause([box_now, -box_next] + push_in[(i, j)])
+            self.cnf.add_clause([-box_now, box_next] + push_out[(i, j)])
+
+    def encode_layer(self, t):
+        if self.encoding == "push":
+            self.encode_push_step(t)
+        else:
+            self.encode_action_step(t)
+            self.encode_state_step(t)
+
+    def get_symbol(self, var):
+        if var not in self.symbols:
+            name = f"x({var})" # auxiliary variable of a goal or an at-most-one encoding
+            for arr in self.arrays:
+                if var in arr:
+                    name = arr.get_symbol_name(arr.get_values(var)[1])
+            self.symbols[var] = Symbol(name)
+        return self.symbols[var]
+
+    def to_formula(self, clauses):
+        return And([Or([self.get_symbol(lit) if lit > 0 else Not(self.get_symbol(-lit)) for lit in clause])
+                    for clause in clauses])
+
+    def get_pysmt_model(self): # truth value per variable id, variables the solver never saw are false
+        model = np.zeros(self.cnf.n_vars + 1, dtype=bool)
+        for var, symbol in self.symbols.items():
+            model[var] = self.solver.get_value(symbol).is_true()
+        return model
 
     def init_pysmt_solver(self):
+        self.formula = self.to_formula(self.cnf.clauses)
         self.solver = Solver()
         self.solver.add_assertion(self.formula)
 
+    def solve_incremental(self):
+        # one solver for all horizons, each call adds a single layer and asks for the goal under an assumption
+        self.solver = Solver()
+        self.encode_init_state()
+        for time in range(1, self.step_limit + 1):
+            self.encode_layer(time - 1)
+            goal = self.encode_goal_step(time)
+            self.solver.add_assertion(self.to_formula(self.cnf.clauses[self.n_asserted:]))
+            self.n_asserted = len(self.cnf.clauses)
+            if self.solver.solve([self.get_symbol(goal)]):
+                self.horizon = time
+                self.model = self.get_pysmt_model()
+                self.controls = self.parse_solution()
+                return
+        print(f"No solution found in {self.step_limit} steps")
+
+    def solve_dimacs(self):
+        # hand the integer CNF to an external CDCL solver and read back its "v" lines
+        assert self.sat_command is not None, "the dimacs backend needs sat_command"
+        with tempfile.NamedTemporaryFile('w', suffix=".cnf", delete=False) as file:
+            file.write(self.cnf.to_dimacs())
+        try:
+            output = subprocess.run(list(self.sat_command) + [file.name], stdout=subprocess.PIPE, text=True).stdout
+        finally:
+            os.remove(file.name)
+        model = np.zeros(self.cnf.n_vars + 1, dtype=bool)
+        satisfiable = False
+        for line in output.splitlines():
+            if line.startswith("s "):
+                satisfiable = line.strip() == "s SATISFIABLE"
+            elif line.startswith("v "):
+                lits = np.array(line[2:].split(), dtype=np.int64)
+                model[lits[lits > 0]] = True
+        # a dense block also holds variables that were pruned away, the solver may set those freely
+        return model & self.cnf.used_vars() if satisfiable else None
+
     def solve_for_one(self):
-        controls = None
-        if self.solver is None:
-            self.init_pysmt_solver()
-        if self.solver.solve():
+        if self.incremental:
+            self.solve_incremental()
+            return
+        if self.backend == "dimacs":
+            self.model = self.solve_dimacs()
+        else:
+            if self.solver is None:
+                self.init_pysmt_solver()
+            if self.solver.solve():
+                self.model = self.get_pysmt_model()
+        if self.model is not None:
             self.controls = self.parse_solution()
-            # print(f"Use {len(controls)} steps")
-            # print(controls)
-            # partial_model = [EqualsOrIff(k, self.solver.get_value(k)) for k in self.get_used_keys()]
-            # self.solver.add_assertion(Not(And(partial_model)))
         else:
             print(f"No solution found in {self.step_limit} steps")
 
-
     def get_controls(self):
         return self.controls
 
+    def parse_push_solution(self):
+        ### replay the pushes, walking the worker to each push with BFS ###
+        pushes = [self.push.from_coords(tuple(c)) for c in np.argwhere(self.push.get_block(self.model))]
+        boxes = set(self.init_boxes_loc)
+        worker = self.init_worker_loc
+        controls = []
+        for i, j, tar_i, tar_j, _ in pushes:
+            path = self.walk(boxes, worker, self.Point(i, j)) + [self.Point(tar_i, tar_j)]
+            for pos in path:
+                controls.append(self.control_mapping[(pos.x - worker.x, pos.y - worker.y)])
+                worker = pos
+            boxes.remove(worker)
+            boxes.add(self.Point(2 * tar_i - i, 2 * tar_j - j))
+        return controls
+
+    def walk(self, boxes, start, goal): # shortest worker path, start excluded
+        parent = {start: None}
+        queue = [start]
+        for pos in queue:
+            if pos == goal:
+                break
+            for n in self.get_one_step_move(pos.x, pos.y):
+                if n in self.playabel and n not in boxes and n not in parent:
+                    parent[n] = pos
+                    queue.append(n)
+        path = []
+        while goal != start:
+            path.append(goal)
+            goal = parent[goal]
+        return path[::-1]
+
     def parse_solution(self):
+        if self.encoding == "push":
+            return self.parse_push_solution()
         ### get a sequence of worker positions ###
-        worker = [self.worker_at.get_values(k) for k in self.worker_at.get_all_keys() if self.solver.get_value(k).is_true()]
-        worker = sorted(worker, key=lambda t: t[1][2])
+        worker = np.argwhere(self.worker_at.get_block(self.model)) # (t, cell) rows in time order
         controls = []
         pre_x, pre_y = self.init_worker_loc
-        for pos in worker:
-            _, (x, y, _) = pos
+        for _, c in worker:
+            x, y = self.cells[c]
             offset_x, offset_y = x - pre_x, y - pre_y
             if offset_x != 0 or offset_y != 0:
                 controls.append(self.control_mapping[(offset_x, offset_y)])
                 pre_x = x
                 pre_y = y
         return controls
-
-
-
-
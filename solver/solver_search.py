@@ -2,37 +2,103 @@ from solver.solver_basic import SokobanSolverBasic
 from heapdict import heapdict
 import numpy as np
 from scipy.optimize import linear_sum_assignment
-import os
-from solver.search_util.state import GameState
+from collections import deque
+import heapq
+import time
+from solver.search_util.state import GameState, iter_bits
+from solver.search_util.deadlock import DeadlockChecker, ALL_RULES
+from solver.search_util.transposition import TranspositionTable
+from solver.search_util.experience import ExperienceWriter
+
+UNREACHABLE = 10 ** 6
 
 
 class SokobanSolverSearch(SokobanSolverBasic):
-    def __init__(self, map, step_limit, data_dir=None):
+    def __init__(self, map, step_limit, data_dir=None, mode="step", deadlock_rules=ALL_RULES, heuristic="bfs",
+                 bidirectional=False, strategy="best_first", weight=1.0, beam_width=100, deadline=None,
+                 max_frontier=None, table_mb=None, evaluator=None, pop_batch=16):
         super().__init__(map)
-        self.init_game_info = GameState(self.init_boxes_loc, self.init_worker_loc, None)
+        assert mode in ["step", "push"]
+        self.mode = mode
+        # meet in the middle of forward pushes and backward pulls, both sides work on normalized push states
+        assert not bidirectional or mode == "push", "bidirectional search needs push mode"
+        self.bidirectional = bidirectional
+        # best_first: stop at the first goal, beam: keep the beam_width best states per depth,
+        # anytime: keep searching after a goal and prune with the incumbent until the frontier empties or deadline
+        assert strategy in ["best_first", "beam", "anytime"], f"Unknown strategy {strategy}"
+        self.strategy = strategy
+        if weight < 0:
+            raise ValueError(f"weight must be >= 0, got {weight}")
+        self.weight = weight # score is g + weight * h, weighted A* for weight > 1, uniform cost for weight 0
+        self.beam_width = beam_width
+        self.deadline = deadline # seconds
+        self.max_frontier = max_frontier # the worst entries are evicted beyond this size
+        # bidirectional search has its own loop, it honors the deadline but not the other strategies or eviction
+        assert not bidirectional or (strategy == "best_first" and max_frontier is None), \
+            "bidirectional search supports neither beam/anytime strategies nor max_frontier"
+        self.improvements = [] # (seconds, steps) per solution found
+        self.n_evicted = 0
+        self.n_generated = 0 # every successor built by an expansion, duplicates and dead states included
+        # closed set in a fixed size transposition table instead of a set of GameState objects
+        assert table_mb is None or (strategy == "best_first" and not bidirectional), \
+            "the transposition table supports best_first search only"
+        self.table_mb = table_mb
+        self.dock_bits = self.to_bits(self.docks)
+        self.dock_cells = sorted(self.cell_index[p] for p in self.docks)
+        self.push_dist = self.get_push_distance(self.dock_cells)
+        self.pull_dist = None
+        if self.bidirectional: # pulls needed to bring a box from each cell back to each initial box
+            self.pull_dist = self.get_push_distance(sorted(self.cell_index[p] for p in self.init_boxes_loc), pull=False)
+        heuristics = {"bfs": self.bfs_evaluate, "random": self.random_evaluate, "cost_ot": self.cost_ot_evaluate,
+                      "push_ot": self.push_ot_evaluate, "incremental_ot": self.incremental_ot_evaluate,
+                      "learned": self.learned_evaluate}
+        assert heuristic in heuristics, f"Unknown heuristic {heuristic}"
+        self.heuristic = heuristic
+        self.evaluate = heuristics[heuristic]
+        # learned: a LearnedEvaluator or the path of a saved Value_Net, successors of pop_batch frontier pops
+        # are scored together in one forward pass
+        self.evaluator = evaluator
+        self.pop_batch = pop_batch
+        if heuristic == "learned":
+            assert evaluator is not None, "the learned heuristic needs an evaluator"
+            if isinstance(evaluator, str):
+                from solver.search_util.learned import LearnedEvaluator # torch is only needed here
+                self.evaluator = LearnedEvaluator.load(evaluator)
+            self.evaluator.bind(self)
+        self.deadlock = DeadlockChecker(self, deadlock_rules)
+        init_boxes = self.to_bits(self.init_boxes_loc)
+        init_worker = self.cell_index[self.init_worker_loc]
+        if self.mode == "push":
+            init_worker = self.normalize_worker(init_boxes, init_worker)
+        self.init_game_info = GameState(init_boxes, init_worker, None, hash_key=self.zobrist_key(init_boxes, init_worker))
         self.step_limit = step_limit
         self.solution_history = None
+        self.n_expanded = 0
+        self.bytes_per_state = self.init_game_info.nbytes()
 
     def win(self, s):
-        return s.boxes == self.docks # set equivalence
-
-    def push_box(self, worker, box, all_boxes):# return the new worker postion and new box posistion
-        new_worker_and_box = None
-        offset_x, offset_y = box.x - worker.x, box.y - worker.y
-        assert (offset_x, offset_y) in self.control_mapping
-        push_tar = self.Point(box.x + offset_x, box.y + offset_y)
-        if push_tar not in self.walls and push_tar not in all_boxes:
-            new_worker_and_box = (box, push_tar)
-        return new_worker_and_box
-
-    def at_dead_corner(self, box):
-        ans = False
-        if box not in self.docks:
-            x, y = box
-            if self.Point(x+1, y) in self.walls or self.Point(x-1, y) in self.walls:
-                if self.Point(x, y+1) in self.walls or self.Point(x, y-1) in self.walls:
-                    ans = True
-        return ans
+        return s.boxes == self.dock_bits # bitboard equivalence
+
+    def get_push_distance(self, targets, pull=True):
+        # pushes needed to bring a box from each cell to each target, walls only, BFS of pulls from every target
+        # with pull=False the BFS pushes away from the targets and counts the pulls back to them instead
+        dist = np.full(shape=(len(self.cells), len(targets)), fill_value=UNREACHABLE, dtype=np.int64)
+        for k, target in enumerate(targets):
+            dist[target, k] = 0
+            queue = deque([target])
+            while queue:
+                cell = queue.popleft()
+                for d, pos in enumerate(self.neighbours[cell]):
+                    if pos < 0 or dist[pos, k] != UNREACHABLE:
+                        continue
+                    worker = self.neighbours[pos][d] if pull else self.neighbours[cell][d ^ 1] # cell the worker needs
+                    if worker >= 0:
+                        dist[pos, k] = dist[cell, k] + 1
+                        queue.append(pos)
+        return dist
+
+    def box_points(self, boxes):
+        return [self.cells[i] for i in iter_bits(boxes)]
 
     def get_seq_controls(self):
         controls = []
@@ -45,155 +111,427 @@ class SokobanSolverSearch(SokobanSolverBasic):
             pre_worker = worker
         return controls
 
-    def get_data(self, data_dir):
+    def get_data(self, data_dir, level): # append the solved episode to the experience shards in data_dir
         assert self.solution_history is not None
-        time_length = len(self.solution_history)
-        n_walls = len(self.walls)
-        n_docks = len(self.docks)
-        n_boxes = len(self.init_boxes_loc)
-        n_woker = 1
-        n_point = n_walls + n_docks + n_boxes + n_woker
-        n_feature = 4 # wall, box, docks, worker
-        n_action = 4
-
-        actions = np.zeros(shape=(time_length-1, n_action))
-        scores = np.zeros(shape=(time_length))
-        features = np.zeros(shape=(time_length, n_point, n_feature))
-        point_cloud = np.zeros(shape=(time_length, n_point, 2))
-
-        all_action = list(self.control_mapping.values())
-
-        cur_boxes = self.init_boxes_loc
-        cur_worker = self.init_worker_loc
-
-        for t in range(0, len(self.solution_history)):
-            n = 0
-            for f, one_set in enumerate([self.walls, self.docks, cur_boxes]):
-                for x, y in one_set:
-                    features[t, n, f] = 1
-                    point_cloud[t, n, 0],  point_cloud[t, n, 1] = x, y
-                    n += 1
-            point_cloud[t, n, 0], point_cloud[t, n, 1] = cur_worker.x, cur_worker.y
-            features[t, n, 3] = 1
-            scores[t] = len(self.solution_history) - (t+1)
-
-            if t < len(self.solution_history)-1:
-                worker = self.solution_history[t]
-                next_worker = self.solution_history[t+1]
-                offset_x, offset_y = next_worker.x - worker.x, next_worker.y - worker.y
-                a = all_action.index(self.control_mapping[(offset_x, offset_y)])
-                actions[t, a] = 1
-
-                if next_worker in cur_boxes: # only update box position when push happens
-                    new_worker, new_box = self.push_box(cur_worker, next_worker, cur_boxes)
-                    new_boxes = set(cur_boxes)
-                    new_boxes.remove(new_worker)
-                    new_boxes.add(new_box)
-                    cur_boxes = new_boxes
-                cur_worker = next_worker
-        np.save(os.path.join(data_dir, "points.npy"), point_cloud)
-        np.save(os.path.join(data_dir, "features.npy"), features)
-        np.save(os.path.join(data_dir, "scores.npy"), scores)
-        np.save(os.path.join(data_dir, "actions.npy"), actions)
-
+        ExperienceWriter(data_dir).add_episode(level, self.walls, self.docks, self.init_boxes_loc, self.solution_history)
 
     def solve_for_one(self):
         assert self.solution_history is None
-        self.solution_history = self.search()
+        history = self.search()
+        if history is not None:
+            self.solution_history = [self.cells[i] for i in history]
 
     def get_controls(self):
         assert self.solution_history is not None
         return self.get_seq_controls()
 
-    def creat_game_info(self, boxes, worker, parent):
-        return GameState(boxes, worker, parent)
+    def creat_game_info(self, boxes, worker, parent, move=-1, hash_key=None):
+        self.n_generated += 1
+        return GameState(boxes, worker, parent, move, parent.g + 1, hash_key)
+
+    def reachable_cells(self, boxes, worker): # flood fill of the worker over cells without boxes
+        seen = {worker}
+        stack = [worker]
+        while stack:
+            cell = stack.pop()
+            for n in self.neighbours[cell]:
+                if n >= 0 and n not in seen and not boxes >> n & 1:
+                    seen.add(n)
+                    stack.append(n)
+        return seen
+
+    def normalize_worker(self, boxes, worker): # top-left reachable cell stands for the whole region
+        return min(self.reachable_cells(boxes, worker))
+
+    def walk(self, boxes, start, goal): # shortest worker path from start to goal, start excluded
+        parent = {start: None}
+        queue = deque([start])
+        while goal not in parent:
+            cell = queue.popleft()
+            for n in self.neighbours[cell]:
+                if n >= 0 and n not in parent and not boxes >> n & 1:
+                    parent[n] = cell
+                    queue.append(n)
+        path = []
+        while goal != start:
+            path.append(goal)
+            goal = parent[goal]
+        path.reverse()
+        return path
+
+    def expand_pushes(self, path): # turn a sequence of push states into the full worker trajectory
+        boxes = path[0].boxes
+        worker = self.cell_index[self.init_worker_loc]
+        history = [worker]
+        for state in path[1:]:
+            box, d = divmod(state.move, 4)
+            history.extend(self.walk(boxes, worker, self.neighbours[box][d ^ 1])) # d ^ 1 is the opposite direction
+            history.append(box)
+            worker = box
+            boxes = state.boxes
+        return history
+
+    def get_solution_history(self, state):
+        if self.mode == "push":
+            return self.expand_pushes(state.get_path())
+        return state.get_history()
 
     def expand_current_state(self, current):
-        # inefficient one-step state expansion, can be improved with inheritance
-        x, y = current.worker
-        reachable = self.get_one_step_move(x, y)
+        if self.mode == "push":
+            return self.expand_push_state(current)
+        # one-step state expansion, boxes are shared with the parent unless a push happens
+        # the child's Zobrist key is the parent's with the moved pieces XORed out and in
+        boxes = current.boxes
+        zobrist_box, zobrist_worker = self.zobrist_box, self.zobrist_worker
+        key = current.hash_key ^ zobrist_worker[current.worker]
         successors = []
-        for pos in reachable:
-            if pos not in current.boxes: # can move
-                new_boxes = set(current.boxes)
-                child = self.creat_game_info(new_boxes, pos, current)
-                successors.append(child)
+        for d, pos in enumerate(self.neighbours[current.worker]):
+            if pos < 0:
+                continue
+            if not boxes >> pos & 1: # can move
+                successors.append(self.creat_game_info(boxes, pos, current, -1, key ^ zobrist_worker[pos]))
             else:
-                new_worker_and_box = self.push_box(current.worker, pos, current.boxes)
-                if new_worker_and_box is not None:
-                    new_worker, new_box = new_worker_and_box
-                    new_boxes = set(current.boxes)
-                    new_boxes.remove(new_worker)
-                    new_boxes.add(new_box)
-                    child = self.creat_game_info(new_boxes, new_worker, current)
-                    successors.append(child)
+                push_tar = self.neighbours[pos][d]
+                if push_tar >= 0 and not boxes >> push_tar & 1:
+                    new_boxes = boxes ^ (1 << pos) ^ (1 << push_tar)
+                    new_key = key ^ zobrist_worker[pos] ^ zobrist_box[pos] ^ zobrist_box[push_tar]
+                    successors.append(self.creat_game_info(new_boxes, pos, current, pos * 4 + d, new_key))
+        return successors
+
+    def expand_push_state(self, current):
+        # macro expansion, every successor is one push from somewhere in the worker's region
+        boxes = current.boxes
+        key = current.hash_key ^ self.zobrist_worker[current.worker]
+        successors = []
+        for cell in self.reachable_cells(boxes, current.worker):
+            for d, pos in enumerate(self.neighbours[cell]):
+                if pos >= 0 and boxes >> pos & 1:
+                    push_tar = self.neighbours[pos][d]
+                    if push_tar >= 0 and not boxes >> push_tar & 1:
+                        new_boxes = boxes ^ (1 << pos) ^ (1 << push_tar)
+                        worker = self.normalize_worker(new_boxes, pos)
+                        new_key = key ^ self.zobrist_worker[worker] ^ self.zobrist_box[pos] ^ self.zobrist_box[push_tar]
+                        successors.append(self.creat_game_info(new_boxes, worker, current, pos * 4 + d, new_key))
         return successors
 
+    def goal_states(self): # boxes on the docks, one state per worker region next to a box
+        states = []
+        seen = set()
+        for cell in range(len(self.cells)):
+            if cell in seen or self.dock_bits >> cell & 1:
+                continue
+            region = self.reachable_cells(self.dock_bits, cell)
+            seen |= region
+            if any(n >= 0 and self.dock_bits >> n & 1 for c in region for n in self.neighbours[c]):
+                worker = min(region)
+                states.append(GameState(self.dock_bits, worker, None, hash_key=self.zobrist_key(self.dock_bits, worker)))
+        return states
+
+    def expand_pull_state(self, current):
+        # reverse macro expansion, every predecessor is one pull from somewhere in the worker's region
+        # move is the forward push leading from the predecessor back to current
+        boxes = current.boxes
+        key = current.hash_key ^ self.zobrist_worker[current.worker]
+        predecessors = []
+        for cell in self.reachable_cells(boxes, current.worker):
+            for d, pos in enumerate(self.neighbours[cell]):
+                if pos >= 0 and boxes >> pos & 1:
+                    back = self.neighbours[cell][d ^ 1]
+                    if back >= 0 and not boxes >> back & 1:
+                        new_boxes = boxes ^ (1 << pos) ^ (1 << cell)
+                        worker = self.normalize_worker(new_boxes, back)
+                        new_key = key ^ self.zobrist_worker[worker] ^ self.zobrist_box[pos] ^ self.zobrist_box[cell]
+                        predecessors.append(self.creat_game_info(new_boxes, worker, current, cell * 4 + d, new_key))
+        return predecessors
+
+    def pull_ot_evaluate(self, game_state): # lower bound of pulls back to the initial boxes
+        cost = self.pull_dist[list(iter_bits(game_state.boxes))]
+        row_idx, col_idx = linear_sum_assignment(cost)
+        return game_state.g + int(cost[row_idx, col_idx].sum())
+
+    def join_paths(self, forward, backward): # forward push states, then the backward chain replayed as pushes
+        path = forward.get_path()
+        while backward.parent is not None:
+            path.append(GameState(backward.parent.boxes, backward.parent.worker, None, backward.move))
+            backward = backward.parent
+        return path
+
+    def search_bidirectional(self):
+        # always expand the smaller of the two frontiers, stop at the first state already seen by the other side
+        frontiers = (heapdict(), heapdict())
+        seen = ({}, {}) # state -> the instance stored, for following its parents
+        evaluate = (self.score, self.pull_ot_evaluate)
+        expand = (self.expand_push_state, self.expand_pull_state)
+        for side, states in enumerate([[self.init_game_info], self.goal_states()]):
+            for s in states:
+                seen[side][s] = s
+                frontiers[side][s] = evaluate[side](s)
+        meeting = (self.init_game_info, seen[1][self.init_game_info]) if self.init_game_info in seen[1] else None
+        time0 = time.time()
+        while meeting is None and len(frontiers[0]) > 0 and len(frontiers[1]) > 0:
+            if self.deadline is not None and time.time() - time0 > self.deadline:
+                break
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            current, _ = frontiers[side].popitem()
+            self.n_expanded += 1
+            for s in expand[side](current):
+                if s in seen[1 - side]:
+                    other = seen[1 - side][s]
+                    meeting = (s, other) if side == 0 else (other, s)
+                    break
+                if s in seen[side]:
+                    continue
+                if side == 0 and self.is_dead_state(s):
+                    continue
+                score = evaluate[side](s)
+                if side == 1 and score - s.g >= UNREACHABLE: # some box can never be pulled back
+                    continue
+                seen[side][s] = s
+                frontiers[side][s] = score
+        if meeting is None:
+            return None
+        print(f"State Searched {len(seen[0])} forward, {len(seen[1])} backward")
+        print(f"Bytes per state {self.bytes_per_state}")
+        print(self.deadlock.report())
+        return self.expand_pushes(self.join_paths(*meeting))
+
+    def score(self, game_state): # g + weight * h on top of the selected heuristic
+        f = self.evaluate(game_state)
+        if self.weight == 1:
+            return f
+        return game_state.g + self.weight * (f - game_state.g)
+
+    def lower_bound(self, game_state, score): # g + h recovered from a weighted score
+        if self.weight == 0: # the score holds no h, g alone is still a bound
+            return game_state.g
+        return game_state.g + (score - game_state.g) / self.weight
+
+    def report_solution(self, state, solution, time0):
+        self.improvements.append((time.time() - time0, len(solution) - 1))
+        pushes = f" ({state.g} pushes)" if self.mode == "push" else ""
+        print(f"Solution with {len(solution) - 1} steps{pushes} after {time.time() - time0:.2f} seconds")
+
+    def trim_frontier(self, frontier): # evict the worst entries, down to 90% so trimming is amortized
+        keep = int(self.max_frontier * 0.9)
+        for s, _ in heapq.nlargest(len(frontier) - keep, frontier.items(), key=lambda item: item[1]):
+            del frontier[s]
+            self.n_evicted += 1
+
+    def table_path(self, table, slot, last): # push states rebuilt by replaying the moves of a table chain
+        boxes = self.init_game_info.boxes
+        path = []
+        for worker, move in table.chain(slot) + [(last.worker, last.move)]:
+            if move >= 0:
+                box, d = divmod(move, 4)
+                boxes ^= (1 << box) ^ (1 << self.neighbours[box][d])
+            path.append(GameState(boxes, worker, None, move))
+        return path
+
+    def search_table(self):
+        # expanded states only live on as table slots, frontier states point to their parent's slot
+        # through an integer parent, so the search tree is not kept alive by references
+        table = TranspositionTable(self.table_mb * 1024 * 1024)
+        time0 = time.time()
+        frontier = heapdict()
+        frontier[self.init_game_info] = self.score(self.init_game_info)
+        solution = None
+        while len(frontier) > 0 and solution is None:
+            if self.deadline is not None and time.time() - time0 > self.deadline:
+                break
+            if table.is_full():
+                print(f"Transposition table full after {table.size} states")
+                break
+            current, _ = frontier.popitem()
+            parent = -1 if current.parent is None else current.parent
+            slot = table.insert(current.hash_key, parent, current.worker, current.move, current.g)
+            for s in self.expand_current_state(current):
+                if self.win(s):
+                    path = self.table_path(table, slot, s)
+                    solution = self.expand_pushes(path) if self.mode == "push" else [p.worker for p in path]
+                    self.report_solution(s, solution, time0)
+                    break
+                if s not in frontier and s.hash_key not in table and not self.is_dead_state(s):
+                    frontier[s] = self.score(s)
+                    s.parent = slot # after scoring, the incremental heuristic reads the parent object
+            if self.max_frontier is not None and len(frontier) > self.max_frontier:
+                self.trim_frontier(frontier)
+        if solution is not None:
+            print(f"State Searched {table.size + len(frontier)}")
+            print(f"Transposition table {table.size} / {table.capacity} slots, {table.nbytes()} bytes")
+            print(self.deadlock.report())
+        self.n_expanded = table.size
+        return solution
+
+    def search_batched(self):
+        # best first over batches, pop_batch states are expanded at once and all their new successors
+        # are scored by the learned evaluator in a single call
+        time0 = time.time()
+        frontier = heapdict()
+        frontier[self.init_game_info] = self.score(self.init_game_info)
+        expanded = set()
+        while len(frontier) > 0:
+            if self.deadline is not None and time.time() - time0 > self.deadline:
+                break
+            children = {}
+            for _ in range(min(self.pop_batch, len(frontier))):
+                current, _ = frontier.popitem()
+                expanded.add(current)
+                for s in self.expand_current_state(current):
+                    if self.win(s):
+                        solution = self.get_solution_history(s)
+                        self.report_solution(s, solution, time0)
+                        print(f"State Searched {len(expanded)+len(frontier)+len(children)}")
+                        print(self.evaluator.report())
+                        print(self.deadlock.report())
+                        self.n_expanded = len(expanded)
+                        return solution
+                    if s not in expanded and s not in frontier and s not in children and not self.is_dead_state(s):
+                        children[s] = s
+            children = list(children)
+            for s, h in zip(children, self.evaluator(children)):
+                frontier[s] = s.g + self.weight * h
+            if self.max_frontier is not None and len(frontier) > self.max_frontier:
+                self.trim_frontier(frontier)
+        self.n_expanded = len(expanded)
+        return None
+
     def search(self):
+        if self.bidirectional:
+            return self.search_bidirectional()
+        if self.strategy == "beam":
+            return self.search_beam()
+        if self.table_mb is not None:
+            return self.search_table()
+        if self.heuristic == "learned" and self.strategy == "best_first":
+            return self.search_batched()
+        time0 = time.time()
         frontier = heapdict()
-        frontier[self.init_game_info] = self.bfs_evaluate(self.init_game_info)
+        frontier[self.init_game_info] = self.score(self.init_game_info)
         solution = None
+        best = None # incumbent goal state, its g bounds the anytime search
         expanded = set()
-        while frontier.peekitem() and solution is None:
-            current, _ = frontier.popitem()
+        best_g = {} # anytime only, a state reached again with a lower g is reopened
+        while len(frontier) > 0 and (solution is None or self.strategy == "anytime"):
+            if self.deadline is not None and time.time() - time0 > self.deadline:
+                break
+            current, score = frontier.popitem()
+            if best is not None and self.lower_bound(current, score) >= best.g:
+                continue
             expanded.add(current)
             successors = self.expand_current_state(current)
             for s in successors:
                 if self.win(s):
-                    solution = s.get_history()
-                    print(f"State Searched {len(expanded)+len(frontier)}")
-                    break
+                    if best is None or s.g < best.g:
+                        best = s
+                        solution = self.get_solution_history(s)
+                        self.report_solution(s, solution, time0)
+                    if self.strategy != "anytime":
+                        break
+                elif self.strategy == "anytime":
+                    if s.g < best_g.get(s, UNREACHABLE) and not self.is_dead_state(s):
+                        best_g[s] = s.g
+                        score = self.score(s)
+                        if best is None or self.lower_bound(s, score) < best.g:
+                            expanded.discard(s)
+                            if s in frontier:
+                                del frontier[s]
+                            frontier[s] = score
                 else:
                     if s not in expanded and s not in frontier and not self.is_dead_state(s):
-                        score = self.bfs_evaluate(s)
-                        frontier[s] = score
+                        frontier[s] = self.score(s)
+            if self.max_frontier is not None and len(frontier) > self.max_frontier:
+                self.trim_frontier(frontier)
+        if solution is not None:
+            print(f"State Searched {len(expanded)+len(frontier)}")
+            print(f"Bytes per state {self.bytes_per_state}")
+            print(self.deadlock.report())
+        if self.n_evicted > 0:
+            print(f"Evicted {self.n_evicted} frontier states")
+        self.n_expanded = len(expanded)
         return solution
 
+    def search_beam(self): # breadth first by depth, only the beam_width best scored states of a layer survive
+        time0 = time.time()
+        layer = [self.init_game_info]
+        seen = {self.init_game_info}
+        while layer:
+            if self.deadline is not None and time.time() - time0 > self.deadline:
+                break
+            candidates = []
+            for current in layer:
+                self.n_expanded += 1
+                for s in self.expand_current_state(current):
+                    if self.win(s):
+                        solution = self.get_solution_history(s)
+                        self.report_solution(s, solution, time0)
+                        print(f"State Searched {len(seen)}")
+                        print(self.deadlock.report())
+                        return solution
+                    if s not in seen and not self.is_dead_state(s):
+                        seen.add(s)
+                        candidates.append((self.score(s), s))
+            layer = [s for _, s in heapq.nsmallest(self.beam_width, candidates, key=lambda item: item[0])]
+        return None
+
     def is_dead_state(self, state):
-        for box in state.boxes:
-            if self.at_dead_corner(box):
-                return True
-        return False
-
-    def get_depth(self, state):
-        d = 0
-        while state is not None:
-            state = state.parent
-            d += 1
-        return d
+        return self.deadlock.is_dead(state)
 
     def bfs_evaluate(self, game_state):# consistent heuristic
-        score = self.get_depth(game_state)
-        return score
+        return game_state.g
+
+    def learned_evaluate(self, game_state): # not admissible, single state fallback of the batched evaluator
+        return game_state.g + self.evaluator([game_state])[0]
 
     def random_evaluate(self, game_state):# not consistent heuristic
-        return self.get_depth(game_state) + np.random.random()
+        return game_state.g + np.random.random()
 
     def cost_ot_evaluate(self, game_state): # consistent heuristic, lower bound of moves need to be taken
         n_box = len(self.docks)
         cost = np.zeros(shape=(n_box, n_box))
         for i, (x1, y1) in enumerate(self.docks):
-            for j, (x2, y2) in enumerate(game_state.boxes):
+            for j, (x2, y2) in enumerate(self.box_points(game_state.boxes)):
                 cost[i,j] = abs(x1-x2) + abs(y1-y2)
         row_idx, col_idx = linear_sum_assignment(cost)
-        return self.get_depth(game_state) + cost[row_idx, col_idx].sum()
+        return game_state.g + cost[row_idx, col_idx].sum()
 
     def ot_evaluate(self, game_state): # consistent heuristic, lower bound of moves need to be taken
         n_box = len(self.docks)
         cost = np.zeros(shape=(n_box, n_box))
         for i, (x1, y1) in enumerate(self.docks):
-            for j, (x2, y2) in enumerate(game_state.boxes):
+            for j, (x2, y2) in enumerate(self.box_points(game_state.boxes)):
                 cost[i,j] = abs(x1-x2) + abs(y1-y2)
         row_idx, col_idx = linear_sum_assignment(cost)
         return cost[row_idx, col_idx].sum()
 
-
-
-
-
-
-
-
-
-
-
+    def assign_docks(self, boxes): # optimal box to dock matching on the push distance table
+        cost = self.push_dist[boxes]
+        row_idx, col_idx = linear_sum_assignment(cost)
+        return int(cost[row_idx, col_idx].sum()), tuple(col_idx.tolist())
+
+    def push_ot_evaluate(self, game_state): # consistent heuristic, lower bound of pushes need to be taken
+        h, _ = self.assign_docks(list(iter_bits(game_state.boxes)))
+        return game_state.g + h
+
+    def incremental_ot_evaluate(self, game_state): # same value as push_ot_evaluate, reusing the parent's matching
+        parent = game_state.parent
+        if parent is None or parent.assignment is None:
+            game_state.h, game_state.assignment = self.assign_docks(list(iter_bits(game_state.boxes)))
+        elif game_state.move < 0: # plain step, boxes are unchanged
+            game_state.h, game_state.assignment = parent.h, parent.assignment
+        else:
+            old_box, d = divmod(game_state.move, 4)
+            new_box = self.neighbours[old_box][d]
+            boxes = list(iter_bits(parent.boxes))
+            i = boxes.index(old_box)
+            dock = parent.assignment[i]
+            # one push lowers the optimum by at most one, so moving one step closer to the
+            # assigned dock keeps the parent's matching optimal and only the moved row changes
+            if self.push_dist[new_box, dock] == self.push_dist[old_box, dock] - 1:
+                matched = dict(zip(boxes, parent.assignment))
+                del matched[old_box]
+                matched[new_box] = dock
+                game_state.h = parent.h - 1
+                game_state.assignment = tuple(matched[b] for b in sorted(matched))
+            else:
+                game_state.h, game_state.assignment = self.assign_docks(list(iter_bits(game_state.boxes)))
+        return game_state.g + game_state.h
@@ -0,0 +1,32 @@
+import torch
+from game.engine import SokobanEngine
+from solver.solver_search import SokobanSolverSearch
+from solver.search_util.learned import LearnedEvaluator
+from solver.search_util.value import Value_Net
+
+
+def solve(evaluator, level):
+    matrix = SokobanEngine("levels", level).matrix
+    solver = SokobanSolverSearch(matrix, None, heuristic="learned", evaluator=evaluator, deadline=1.0)
+    solver.solve_for_one()
+
+
+def test_cache_hits_across_solves_of_a_level():
+    torch.manual_seed(0)
+    evaluator = LearnedEvaluator(Value_Net())
+    solve(evaluator, 2)
+    assert evaluator.scored > 0
+    first_hits = evaluator.hits
+    solve(evaluator, 2) # the same states are scored again
+    assert evaluator.hits > first_hits
+
+
+def test_cache_cleared_on_a_new_level():
+    torch.manual_seed(0)
+    evaluator = LearnedEvaluator(Value_Net())
+    solve(evaluator, 2)
+    assert len(evaluator.cache) > 0
+    solve(evaluator, 3)
+    hits = evaluator.hits
+    solve(evaluator, 2) # level 3 replaced the cached level 2 states
+    assert evaluator.hits == hits